@@ -10,6 +10,7 @@
 import sys
 import sysconfig
 import tempfile
+import threading
 from distutils.util import get_platform  # pylint: disable=import-error
 
 
@@ -131,6 +132,22 @@ class NoSuchURL(Exception):
     pass
 
 
+class NotCachedOffline(Exception):
+    """Raised in offline mode for URLs that were never cached.
+
+    Unlike NoSuchURL, this does not tell that the URL does not exist, so it
+    must not be taken as a reason to fall back to something else.
+    """
+
+    def __init__(self, url):
+        Exception.__init__(
+            self,
+            "'%s' is not cached and NUITKA_PYTHON_OFFLINE=1 forbids downloading it."
+            % url,
+        )
+        self.url = url
+
+
 def copytree(src, dst, symlinks=False, ignore=None, executable=False):
     if not os.path.exists(dst):
         os.makedirs(dst)
@@ -145,42 +162,99 @@ def copytree(src, dst, symlinks=False, ignore=None, executable=False):
                 os.chmod(d, 509)  # 775
 
 
-def download_file(url, destination):
+# Keep-alive connections per thread, keyed by scheme and host.
+_connection_pool = threading.local()
+
+
+def _getPooledConnection(scheme, netloc):
+    import http.client
+
+    connections = _connection_pool.__dict__.setdefault("connections", {})
+    if (scheme, netloc) not in connections:
+        if scheme == "https":
+            connections[scheme, netloc] = http.client.HTTPSConnection(netloc, timeout=60)
+        else:
+            connections[scheme, netloc] = http.client.HTTPConnection(netloc, timeout=60)
+
+    return connections[scheme, netloc]
+
+
+def _openPooled(url, headers):
+    import http.client
+    from urllib.parse import urljoin, urlsplit
+
+    for _redirect in range(10):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        connection = _getPooledConnection(parts.scheme, parts.netloc)
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The server may have closed an idle keep-alive connection, retry once.
+            connection.close()
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+
+        if response.status in (301, 302, 303, 307, 308):
+            response.read()
+            url = urljoin(url, response.getheader("Location"))
+            continue
+
+        return url, response
+
+    raise OSError("Too many redirects for '%s'." % url)
+
+
+def _dropPooledConnection(url):
+    from urllib.parse import urlsplit
+
+    # Unread data of an abandoned response would be taken for the next one.
+    parts = urlsplit(url)
+    connections = _connection_pool.__dict__.get("connections", {})
+    connection = connections.pop((parts.scheme, parts.netloc), None)
+    if connection is not None:
+        connection.close()
+
+
+def _openUrl(url, headers):
+    """Open a URL, returns the final URL, status, header lookup and stream."""
     if str is bytes:
-        from urllib2 import URLError, HTTPError, Request, urlopen
+        from urllib2 import HTTPError, Request, getproxies, urlopen
     else:
-        from urllib.request import URLError, HTTPError, Request, urlopen
+        from urllib.request import HTTPError, Request, getproxies, urlopen
 
-    try:
-        my_print("Attempting to download '%s'." % url, style="blue")
+    scheme = url.split(":", 1)[0].lower()
 
-        req = Request(url, headers={"User-Agent": "Nuitka-Python"})
-        with contextlib.closing(urlopen(req)) as fp:
-            if (
-                "content-disposition" in fp.headers
-                and "filename=" in fp.headers["content-disposition"]
-            ):
-                destination_file = os.path.join(
-                    destination,
-                    fp.headers["content-disposition"].split("filename=")[-1].strip('"'),
-                )
-            else:
-                destination_file = os.path.join(
-                    destination, os.path.basename(fp.geturl())
-                )
+    # Connection reuse for plain HTTP(S), proxies are left to urllib.
+    if scheme in ("http", "https") and scheme not in getproxies():
+        final_url, response = _openPooled(url, headers)
+        if response.status >= 400:
+            response.read()
+            raise HTTPError(final_url, response.status, response.reason, response.msg, None)
+        return final_url, response.status, response.getheader, response
+
+    response = urlopen(Request(url, headers=headers))
+    return (
+        response.geturl(),
+        getattr(response, "status", None) or 200,
+        response.headers.get,
+        response,
+    )
 
-            parent_dir = os.path.dirname(destination_file)
-            if not os.path.exists(parent_dir):
-                os.makedirs(parent_dir)
 
-            with open(destination_file, "wb") as out_file:
-                bs = 1024 * 8
-                while True:
-                    block = fp.read(bs)
-                    if not block:
-                        break
-                    out_file.write(block)
+@contextlib.contextmanager
+def _translateUrlErrors(url):
+    if str is bytes:
+        from urllib2 import URLError, HTTPError
+    else:
+        from urllib.request import URLError, HTTPError
 
+    try:
+        yield
     except HTTPError as e:
         if e.code == 404:
             raise NoSuchURL(url)
@@ -198,9 +272,183 @@ def download_file(url, destination):
         else:
             raise
 
+
+def _getDownloadFilename(destination, final_url, getheader):
+    content_disposition = getheader("content-disposition")
+    if content_disposition and "filename=" in content_disposition:
+        return os.path.join(
+            destination, content_disposition.split("filename=")[-1].strip('"')
+        )
+    else:
+        return os.path.join(destination, os.path.basename(final_url.split("?")[0]))
+
+
+def _checkHash(url, expected_hash, file_hash):
+    if file_hash.hexdigest() != expected_hash.rpartition(":")[2].lower():
+        raise ValueError(
+            "Hash mismatch for '%s', expected %s but got %s."
+            % (url, expected_hash, file_hash.hexdigest())
+        )
+
+
+def _newHash(expected_hash):
+    import hashlib
+
+    return hashlib.new(expected_hash.rpartition(":")[0] or "sha256")
+
+
+def _getPartFilename(destination, url):
+    import hashlib
+
+    # Partial data is kept under a name derived from the URL, the final name is
+    # only known from the response.
+    return os.path.join(
+        destination, ".%s.part" % hashlib.sha256(url.encode("utf8")).hexdigest()[:16]
+    )
+
+
+def _getResumeValidator(getheader):
+    # Weak entity tags are not allowed for "If-Range".
+    etag = getheader("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return getheader("last-modified")
+
+
+def _getContentRangeStart(content_range):
+    # Looks like "bytes 1000-1999/2000".
+    try:
+        unit, byte_range = content_range.split(None, 1)
+        if unit.lower() != "bytes":
+            return None
+        return int(byte_range.split("-", 1)[0])
+    except (AttributeError, ValueError):
+        return None
+
+
+def _removeFiles(*filenames):
+    for filename in filenames:
+        try:
+            os.unlink(filename)
+        except FileNotFoundError:
+            pass
+
+
+def _openResumable(url, part_file):
+    """Open a URL, resuming the partial download in the part file if possible.
+
+    Only resumes if the partial data is still of the same version of the file,
+    which "If-Range" leaves to the server, and if the server continues exactly
+    where the part file ends. Otherwise the part file is discarded and the
+    download starts over.
+    """
+    if str is bytes:
+        from urllib2 import HTTPError
+    else:
+        from urllib.request import HTTPError
+
+    validator_file = part_file + ".validator"
+    headers = {"User-Agent": "Nuitka-Python"}
+
+    try:
+        offset = os.path.getsize(part_file)
+        with open(validator_file) as f:
+            validator = f.read()
+    except OSError:
+        offset, validator = 0, None
+
+    if offset > 0 and validator:
+        try:
+            final_url, status, getheader, fp = _openUrl(
+                url,
+                dict(headers, **{"Range": "bytes=%d-" % offset, "If-Range": validator}),
+            )
+        except HTTPError as e:
+            # Range not satisfiable, the partial file is unusable.
+            if e.code != 416:
+                raise
+        else:
+            if status != 206 or _getContentRangeStart(getheader("content-range")) == offset:
+                return final_url, status, getheader, fp
+
+            fp.close()
+            _dropPooledConnection(final_url)
+
+    _removeFiles(part_file, validator_file)
+    return _openUrl(url, headers)
+
+
+def download_file(url, destination, expected_hash=None):
+    """Download a URL into the destination directory.
+
+    Partial downloads are resumed with a HTTP range request, connections to
+    the same host are reused. The optional expected hash is given as
+    "algorithm:hexdigest", e.g. from the "hashes" of a recipe "index.json",
+    with a plain hex digest meaning SHA-256.
+    """
+    os.makedirs(destination, exist_ok=True)
+    part_file = _getPartFilename(destination, url)
+    validator_file = part_file + ".validator"
+
+    with _translateUrlErrors(url):
+        my_print("Attempting to download '%s'." % url, style="blue")
+
+        final_url, status, getheader, fp = _openResumable(url, part_file)
+
+        with contextlib.closing(fp):
+            destination_file = _getDownloadFilename(destination, final_url, getheader)
+            os.makedirs(os.path.dirname(destination_file), exist_ok=True)
+
+            if status != 206:
+                # Without a validator, an interrupted download cannot be resumed.
+                validator = _getResumeValidator(getheader)
+                if validator:
+                    with open(validator_file, "w") as f:
+                        f.write(validator)
+                else:
+                    _removeFiles(validator_file)
+
+            with open(part_file, "ab" if status == 206 else "wb") as out_file:
+                shutil.copyfileobj(fp, out_file, 1024 * 1024)
+
+    if expected_hash:
+        file_hash = _newHash(expected_hash)
+        with open(part_file, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                file_hash.update(block)
+
+        try:
+            _checkHash(url, expected_hash, file_hash)
+        except ValueError:
+            _removeFiles(part_file, validator_file)
+            raise
+
+    os.replace(part_file, destination_file)
+    _removeFiles(validator_file)
+
     return destination_file
 
 
+def download_files(downloads, max_workers=8):
+    """Download many files concurrently.
+
+    Args:
+        downloads: iterable of (url, destination) or (url, destination,
+                   expected_hash) tuples, see download_file
+
+    Returns:
+        List of the downloaded file names, in the order of the downloads.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    downloads = list(downloads)
+    if not downloads:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(downloads))) as executor:
+        return list(executor.map(lambda download: download_file(*download), downloads))
+
+
 def extract_archive(archive_file, destination=None):
     if destination is None:
         destination = os.path.splitext(archive_file)[0]
@@ -210,36 +458,316 @@ def extract_archive(archive_file, destination=None):
     return destination
 
 
-def download_extract(url, destination):
-    with TemporaryDirectory() as dir:
-        downloaded_file = download_file(url, dir)
-        extract_archive(downloaded_file, destination)
+class _TeeReader(object):
+    """File like reader that copies what is read to a file and a hash."""
+
+    def __init__(self, fp, out_file, file_hash, head=b""):
+        self.fp = fp
+        self.out_file = out_file
+        self.file_hash = file_hash
+        # Already read from "fp" to sniff the format, but not yet passed on.
+        self.head = head
+
+    def read(self, size=-1):
+        if self.head:
+            data = self.head if size < 0 else self.head[:size]
+            self.head = self.head[len(data):]
+            if size < 0:
+                data += self.fp.read()
+        else:
+            data = self.fp.read(size)
+
+        if self.out_file is not None:
+            self.out_file.write(data)
+        if self.file_hash is not None:
+            self.file_hash.update(data)
+
+        return data
+
+    def drain(self):
+        while self.read(1024 * 1024):
+            pass
+
+
+def _getCachedArchiveFilename(cache_dir, url, expected_hash):
+    import hashlib
+
+    # Archives of different URLs often share the name, e.g. "v1.0.tar.gz". The
+    # name is kept as a suffix, since the archive format is detected from it.
+    key = hashlib.sha256(
+        ("%s\n%s" % (url, expected_hash or "")).encode("utf8")
+    ).hexdigest()[:16]
+    return os.path.join(cache_dir, "%s-%s" % (key, os.path.basename(url.split("?")[0])))
+
+
+def _isCachedArchiveValid(url, cached_file, expected_hash):
+    if not os.path.isfile(cached_file):
+        return False
+
+    if expected_hash:
+        file_hash = _newHash(expected_hash)
+        with open(cached_file, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                file_hash.update(block)
+
+        try:
+            _checkHash(url, expected_hash, file_hash)
+        except ValueError as e:
+            my_print("Discarding cached archive: %s" % e, style="yellow")
+            os.unlink(cached_file)
+            return False
+
+    return True
+
+
+def _moveTree(src, dst):
+    if not os.path.isdir(dst):
+        os.replace(src, dst)
+        return
+
+    for name in os.listdir(src):
+        if os.path.isdir(os.path.join(src, name)) and not os.path.islink(
+            os.path.join(src, name)
+        ):
+            _moveTree(os.path.join(src, name), os.path.join(dst, name))
+        else:
+            os.replace(os.path.join(src, name), os.path.join(dst, name))
+
+
+def download_extract(url, destination, cache_dir=None, expected_hash=None):
+    """Download an archive and extract it to the destination.
+
+    Tar archives are extracted from the response stream while downloading,
+    into a temporary directory that only gets moved to the destination once
+    the hash was checked. With a cache directory, the archive is also kept
+    there, and extracted from there on later calls. Zip archives, recognized
+    by their name or their content, need random access and are downloaded
+    fully first.
+    """
+    import tarfile
+    import zipfile
+
+    cached_file = None
+    if cache_dir is not None:
+        cached_file = _getCachedArchiveFilename(cache_dir, url, expected_hash)
+        if _isCachedArchiveValid(url, cached_file, expected_hash):
+            shutil.unpack_archive(
+                cached_file,
+                destination,
+                "zip" if zipfile.is_zipfile(cached_file) else "tar",
+            )
+            return destination
+
+    if url.split("?")[0].lower().endswith((".zip", ".whl")):
+        if cache_dir is not None:
+            os.replace(download_file(url, cache_dir, expected_hash), cached_file)
+            return extract_archive(cached_file, destination)
+
+        with TemporaryDirectory() as dir:
+            return extract_archive(
+                download_file(url, dir, expected_hash), destination
+            )
+
+    # Next to the destination, so the files can be moved there by renaming. Not
+    # with "tempfile.mkdtemp", the permissions are to follow the umask.
+    parent_dir = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(parent_dir, exist_ok=True)
+    extract_dir = os.path.join(
+        parent_dir,
+        ".%s-%s" % (os.path.basename(os.path.abspath(destination)), os.urandom(4).hex()),
+    )
+    os.mkdir(extract_dir)
+    zip_file = extract_dir + ".zip"
+
+    part_file = None
+    try:
+        with _translateUrlErrors(url):
+            my_print("Attempting to download '%s'." % url, style="blue")
+
+            _final_url, _status, _getheader, fp = _openUrl(
+                url, {"User-Agent": "Nuitka-Python"}
+            )
+
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(contextlib.closing(fp))
+
+                head = fp.read(4)
+                is_zip = head.startswith(b"PK")
+
+                out_file = None
+                if cache_dir is not None:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    part_file = _getPartFilename(cache_dir, url)
+                    out_file = stack.enter_context(open(part_file, "wb"))
+                elif is_zip:
+                    out_file = stack.enter_context(open(zip_file, "wb"))
+
+                reader = _TeeReader(
+                    fp, out_file, _newHash(expected_hash) if expected_hash else None, head
+                )
+
+                if not is_zip:
+                    with tarfile.open(
+                        fileobj=reader, mode="r|*", bufsize=1024 * 1024
+                    ) as tar:
+                        tar.extractall(extract_dir)
+
+                # Trailing padding after the end of archive marker still counts for
+                # the hash and the cached copy.
+                reader.drain()
+
+        if expected_hash:
+            _checkHash(url, expected_hash, reader.file_hash)
+
+        if is_zip:
+            with zipfile.ZipFile(part_file or zip_file) as archive:
+                archive.extractall(extract_dir)
+
+        _moveTree(extract_dir, destination)
+    except BaseException:
+        if part_file is not None:
+            _removeFiles(part_file)
+        raise
+    finally:
+        shutil.rmtree(extract_dir, ignore_errors=True)
+        _removeFiles(zip_file)
+
+    if part_file is not None:
+        os.replace(part_file, cached_file)
+
+    return destination
+
+
+# Timing records of the commands run with run_with_output in this process.
+_step_timings = []
+
+
+def get_step_timings():
+    """Timing records of the commands run so far, oldest first.
+
+    Each record is a dictionary with "step", "command", "start" (seconds since
+    the epoch), "duration" (seconds), "returncode" and "output_lines".
+    """
+    return list(_step_timings)
+
+
+def _teeStderr(pipe, captured, quiet, log_line):
+    for line in pipe:
+        if not quiet:
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        log_line(line)
+        captured.append(line)
 
 
 def run_with_output(*args, **kwargs):
+    """Run a command, echo its output and return it.
+
+    Keyword arguments:
+        stdin: passed to subprocess
+        quiet: do not echo the output
+        step: name of the build step for the timing records, defaults to the
+              command name
+        log_file: file name to append a timestamped transcript to, defaults to
+                  the NUITKA_PYTHON_BUILD_LOG environment variable
+        max_output_lines: only keep this many of the last lines in memory, for
+                          commands with huge output
+        separate_stderr: keep stderr apart, it is echoed to stderr and attached
+                         to the error, but not returned
+    """
+    import collections
     import subprocess
+    import threading
+    import time
 
     stdin = kwargs.pop("stdin", None)
     quiet = kwargs.pop("quiet", False)
+    step = kwargs.pop("step", None) or os.path.basename(str(args[0]))
+    log_filename = kwargs.pop("log_file", os.environ.get("NUITKA_PYTHON_BUILD_LOG"))
+    max_output_lines = kwargs.pop("max_output_lines", None)
+    separate_stderr = kwargs.pop("separate_stderr", False)
     assert not kwargs
 
-    p = subprocess.Popen(
-        args,
-        universal_newlines=True,
-        stdin=stdin,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
+    if max_output_lines is None:
+        output = []
+    else:
+        output = collections.deque(maxlen=max_output_lines)
+    errors = collections.deque(maxlen=max_output_lines)
+
+    start_time = time.time()
+    start_counter = time.perf_counter()
+
+    log_lock = threading.Lock()
+
+    def log_line(line):
+        if log_file is not None:
+            with log_lock:
+                log_file.write(
+                    "[%9.3fs] %s" % (time.perf_counter() - start_counter, line)
+                )
+
+    with contextlib.ExitStack() as stack:
+        log_file = None
+        if log_filename:
+            log_file = stack.enter_context(
+                open(log_filename, "a", encoding="utf8", errors="replace")
+            )
+            log_file.write(
+                "[%s] %s: %s\n"
+                % (
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start_time)),
+                    step,
+                    subprocess.list2cmdline([str(arg) for arg in args]),
+                )
+            )
+
+        p = subprocess.Popen(
+            args,
+            universal_newlines=True,
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if separate_stderr else subprocess.STDOUT,
+        )
+
+        if separate_stderr:
+            stderr_thread = threading.Thread(
+                target=_teeStderr,
+                args=(p.stderr, errors, quiet, log_line),
+            )
+            stderr_thread.start()
+
+        line_count = 0
+        for line in p.stdout:
+            if not quiet:
+                sys.stdout.write(line)
+                sys.stdout.flush()
+            log_line(line)
+            output.append(line)
+            line_count += 1
+
+        if separate_stderr:
+            stderr_thread.join()
+        p.wait()
+
+        duration = time.perf_counter() - start_counter
+        log_line("%s exited with %d\n" % (step, p.returncode))
+
+    _step_timings.append(
+        {
+            "step": step,
+            "command": [str(arg) for arg in args],
+            "start": start_time,
+            "duration": duration,
+            "returncode": p.returncode,
+            "output_lines": line_count,
+        }
     )
 
-    output = ""
-    for line in p.stdout:
-        if not quiet:
-            sys.stdout.write(line)
-            sys.stdout.flush()
-        output += line
-    p.wait()
+    output = "".join(output)
     if p.returncode != 0:
-        raise subprocess.CalledProcessError(p.returncode, args, output)
+        raise subprocess.CalledProcessError(
+            p.returncode, args, output, "".join(errors) if separate_stderr else None
+        )
     return output
 
 
@@ -344,10 +872,130 @@ def prepend_to_file(file, prepend_str):
         f.write(output)
 
 
+_textchars = bytearray({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+
+
+def _isDataBinary(data):
+    return bool(data.translate(None, _textchars))
+
+
 def is_file_binary(file_path):
-    textchars = bytearray({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
     with open(file_path, "rb") as f:
-        return bool(f.read(1024).translate(None, textchars))
+        return _isDataBinary(f.read(1024))
+
+
+# Files that are never patched as source text.
+REWRITE_SKIP_EXTENSIONS = frozenset(
+    (
+        ".a", ".bin", ".bmp", ".bz2", ".class", ".dat", ".dll", ".dylib",
+        ".exe", ".gif", ".gz", ".ico", ".jar", ".jpeg", ".jpg", ".lib", ".o",
+        ".obj", ".pdb", ".pdf", ".png", ".pyc", ".pyd", ".so", ".tar", ".tgz",
+        ".ttf", ".wasm", ".whl", ".woff", ".woff2", ".xz", ".zip", ".zst",
+    )
+)
+
+
+def rewrite_file(fpath, pattern, rewrite, text_only=True, max_size=32 * 1024 * 1024):
+    """Rewrite a file in place, if it contains a pattern.
+
+    The bytes regular expression pattern is searched in the raw file content,
+    memory mapped for larger files, and only matching files are decoded and
+    passed to "rewrite(fpath, text)", which returns the new text. Bytes are
+    preserved through decoding, including line endings.
+
+    Returns:
+        True if the file was changed.
+    """
+    import mmap
+
+    if not hasattr(pattern, "search"):
+        pattern = re.compile(pattern)
+
+    try:
+        with open(fpath, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return False
+            if size > max_size:
+                my_print(
+                    "Not rewriting file larger than %d bytes: %s" % (max_size, fpath),
+                    style="yellow",
+                )
+                return False
+
+            if size >= 64 * 1024:
+                with contextlib.closing(
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                ) as data:
+                    if text_only and _isDataBinary(data[:1024]):
+                        return False
+                    if not pattern.search(data):
+                        return False
+                    content = data[:]
+            else:
+                content = f.read()
+                if text_only and _isDataBinary(content[:1024]):
+                    return False
+                if not pattern.search(content):
+                    return False
+    except OSError:
+        # Broken links and special files.
+        return False
+
+    text = content.decode("utf8", "surrogateescape")
+    new_text = rewrite(fpath, text)
+    if new_text == text:
+        return False
+
+    with open(fpath, "wb") as f:
+        f.write(new_text.encode("utf8", "surrogateescape"))
+    return True
+
+
+def rewrite_tree(
+    folder,
+    pattern,
+    rewrite,
+    file_filter=None,
+    skip_extensions=REWRITE_SKIP_EXTENSIONS,
+    text_only=True,
+    max_size=32 * 1024 * 1024,
+    jobs=None,
+):
+    """Rewrite the files of a source tree in parallel, see rewrite_file.
+
+    Version control directories are skipped, as are files with one of the skip
+    extensions or rejected by "file_filter(fpath)".
+
+    Returns:
+        Sorted list of the changed files.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not hasattr(pattern, "search"):
+        pattern = re.compile(pattern)
+
+    def iterFiles():
+        for dname, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if ".git" not in d and ".svn" not in d]
+
+            for fname in files:
+                if ".git" in fname or ".svn" in fname:
+                    continue
+                if os.path.splitext(fname)[1].lower() in skip_extensions:
+                    continue
+
+                fpath = os.path.join(dname, fname)
+                if file_filter is None or file_filter(fpath):
+                    yield fpath
+
+    with ThreadPoolExecutor(max_workers=jobs or int(get_num_jobs())) as executor:
+        fpaths = list(iterFiles())
+        changed = executor.map(
+            lambda fpath: rewrite_file(fpath, pattern, rewrite, text_only, max_size),
+            fpaths,
+        )
+        return sorted(fpath for fpath, was_changed in zip(fpaths, changed) if was_changed)
 
 
 def get_num_jobs():
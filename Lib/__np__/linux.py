@@ -10,31 +10,24 @@ def make(*args):
     return run_with_output("make", *args)
 
 
+def _remove_memcpy_wrap(fpath, s):
+    if fpath.endswith(".cc"):
+        return s.replace('"-Wl,-wrap,memcpy"', "")
+    else:
+        return s.replace("-Wl,-wrap,memcpy", "")
+
+
 def auto_patch_Cython_memcpy(folder):
-    # TODO: Have a generic implementation, maybe in nuitka.utils for this
-    for dname, dirs, files in os.walk(folder):
-        for fname in files:
-            fpath = os.path.join(dname, fname)
-            if ".git" in fpath or ".svn" in fpath:
-                continue
-
-            # TODO: Probably unnecessary
-            if fname.endswith(".cc"):
-                with open(fpath, "r") as f:
-                    s = f.read()
-                s2 = s.replace('"-Wl,-wrap,memcpy"', "")
-
-                if s != s2:
-                    my_print("Removed Cython config: %s" % fpath, style="blue")
-                    with open(fpath, "w") as f:
-                        f.write(s2)
-
-            if fname == "setup.py":
-                with open(fpath, "r") as f:
-                    s = f.read()
-                s2 = s.replace("-Wl,-wrap,memcpy", "")
-
-                if s != s2:
-                    my_print("Removed memcpy wrapper config: %s" % fpath, style="blue")
-                    with open(fpath, "w") as f:
-                        f.write(s2)
+    for fpath in rewrite_tree(
+        folder,
+        rb"-Wl,-wrap,memcpy",
+        _remove_memcpy_wrap,
+        # TODO: Probably unnecessary for the ".cc" files
+        file_filter=lambda fpath: fpath.endswith(".cc")
+        or os.path.basename(fpath) == "setup.py",
+        text_only=False,
+    ):
+        if fpath.endswith(".cc"):
+            my_print("Removed Cython config: %s" % fpath, style="blue")
+        else:
+            my_print("Removed memcpy wrapper config: %s" % fpath, style="blue")
@@ -0,0 +1,139 @@
+"""Profile guided optimization with a training workload of our own.
+
+NUITKA_PYTHON_PGO_TRAINING lists the training entries, separated by
+os.pathsep: Python scripts, directories of scripts, which run in name order,
+and ".txt" files with recorded interpreter command lines, one per line. They
+are run with the instrumented interpreter, by "build.sh" through PROFILE_TASK,
+and by "rebuildpython" on Windows, where the relink is profile guided.
+
+The default training of the test suite can be added, with the interpreter
+arguments of the platform, as "build.mac.sh" excludes tests that fail there.
+"""
+
+from __future__ import print_function
+
+import hashlib
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+from .common import my_print
+
+
+def get_training_entries():
+    training = os.environ.get("NUITKA_PYTHON_PGO_TRAINING", "")
+    return [os.path.abspath(entry) for entry in training.split(os.pathsep) if entry]
+
+
+def _get_entry_files(entry):
+    if os.path.isdir(entry):
+        return [
+            os.path.join(entry, filename)
+            for filename in sorted(os.listdir(entry))
+            if filename.endswith(".py")
+        ]
+    else:
+        return [entry]
+
+
+def _get_training_file_tasks(filename):
+    tasks = []
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                tasks.append(shlex.split(line))
+
+    return tasks
+
+
+def get_training_tasks(entries=None):
+    """Interpreter arguments of the training runs."""
+    if entries is None:
+        entries = get_training_entries()
+
+    tasks = []
+    for entry in entries:
+        if entry.endswith(".txt"):
+            tasks += _get_training_file_tasks(entry)
+        else:
+            tasks += [[filename] for filename in _get_entry_files(entry)]
+
+    return tasks
+
+
+def get_training_hash(entries=None):
+    """Hash of the training workload, profiles need retraining when it changes."""
+    if entries is None:
+        entries = get_training_entries()
+
+    filenames = []
+    for entry in entries:
+        filenames += _get_entry_files(entry)
+
+        # Recorded command lines run scripts and read files, which are part of
+        # the workload as well.
+        if entry.endswith(".txt"):
+            for task in _get_training_file_tasks(entry):
+                filenames += [arg for arg in task if os.path.isfile(arg)]
+
+    training_hash = hashlib.sha256()
+    for filename in filenames:
+        training_hash.update(filename.encode("utf8"))
+        with open(filename, "rb") as f:
+            training_hash.update(f.read())
+
+    return training_hash.hexdigest()
+
+
+# Interpreter arguments of the default training task.
+DEFAULT_TEST_TASK = ["-m", "test", "--pgo"]
+
+
+def run_training(executable=None, include_tests=False, env=None, test_task=None):
+    if executable is None:
+        executable = sys.executable
+
+    tasks = get_training_tasks()
+    if include_tests:
+        tasks.append(DEFAULT_TEST_TASK if test_task is None else test_task)
+
+    for task in tasks:
+        my_print("PGO training: %s" % subprocess.list2cmdline(task), style="blue")
+
+        start = time.perf_counter()
+        returncode = subprocess.call([executable] + task, env=env)
+
+        # Like for the default training task, failing runs still give profile data.
+        my_print(
+            "PGO training run took %.1fs%s."
+            % (
+                time.perf_counter() - start,
+                ", exit code %d" % returncode if returncode else "",
+            ),
+            style="blue",
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Run the NUITKA_PYTHON_PGO_TRAINING workload with this interpreter."
+    )
+    parser.add_argument(
+        "--include-tests",
+        nargs="?",
+        const=subprocess.list2cmdline(DEFAULT_TEST_TASK),
+        metavar="ARGS",
+        help='Also run the default training, with these interpreter arguments '
+        '(default: "%(const)s").',
+    )
+    args = parser.parse_args()
+
+    run_training(
+        include_tests=args.include_tests is not None,
+        test_task=shlex.split(args.include_tests) if args.include_tests else None,
+    )
@@ -40,16 +40,8 @@ def nmake(*args):
     return run_compiler_exe("nmake.exe", *args)
 
 
-def auto_patch_MD_MT_file(fpath):
-    try:
-        if fpath.endswith("CMakeLists.txt"):
-            with open(fpath, "r") as f:
-                s = f.read()
-            s2 = s.replace("/MD", "/MT")
-            s2 = s2.replace("-MD", "-MT")
-            s2 = re.sub(
-                r"cmake_minimum_required *\( *VERSION [0-9\.]+ *\)",
-                """cmake_minimum_required(VERSION 3.15)
+# Unlike the build scripts using nputils, also make CMake select the static runtime.
+_cmake_static_runtime_setup = """
             set(CMAKE_MSVC_RUNTIME_LIBRARY MultiThreaded)
             foreach(flag_var
                         CMAKE_C_FLAGS CMAKE_C_FLAGS_DEBUG CMAKE_C_FLAGS_RELEASE
@@ -61,35 +53,33 @@ def auto_patch_MD_MT_file(fpath):
                     endif()
                 endforeach(flag_var)
 
-         """,
-                s2,
-                flags=re.IGNORECASE,
-            )
-            s2 = re.sub(
-                r"cmake_policy\(VERSION [0-9\.]+\)", "", s2, flags=re.IGNORECASE
-            )
-            if s != s2:
-                my_print("Fixed up file: %s" % fpath, style="blue")
-                with open(fpath, "w") as f:
-                    f.write(s2)
-        elif not is_file_binary(fpath):
-            with open(fpath, "r") as f:
-                s = f.read()
-            s2 = s.replace("/MD", "/MT")
-            s2 = s2.replace("-MD", "-MT")
-            if s != s2:
-                my_print("Fixed up file: %s" % fpath, style="blue")
-                with open(fpath, "w") as f:
-                    f.write(s2)
+         """
+
+
+def _patch_MD_MT(fpath, s):
+    # The rewrite is shared with the build scripts, which use it through nputils.
+    import nputils
+
+    return nputils._patch_MD_MT(fpath, s, cmake_setup=_cmake_static_runtime_setup)
+
+
+def auto_patch_MD_MT_file(fpath):
+    from nputils import _MD_MT_pattern
+
+    try:
+        if rewrite_file(
+            fpath,
+            _MD_MT_pattern,
+            _patch_MD_MT,
+            text_only=not fpath.endswith("CMakeLists.txt"),
+        ):
+            my_print("Fixed up file: %s" % fpath, style="blue")
     except Exception:
         pass
 
 
 def auto_patch_MD_MT(folder):
-    for dname, dirs, files in os.walk(folder):
-        for fname in files:
-            fpath = os.path.join(dname, fname)
-            if ".git" in fpath or ".svn" in fpath:
-                continue
+    from nputils import _MD_MT_pattern
 
-            auto_patch_MD_MT_file(fpath)
+    for fpath in rewrite_tree(folder, _MD_MT_pattern, _patch_MD_MT):
+        my_print("Fixed up file: %s" % fpath, style="blue")
@@ -566,16 +566,98 @@ def compile(self, sources, output_dir=None, macros=None,
                                     depends, extra_postargs)
         cc_args = self._get_cc_args(pp_opts, debug, extra_preargs)
 
+        jobs = []
         for obj in objects:
             try:
                 src, ext = build[obj]
             except KeyError:
                 continue
-            self._compile(obj, src, ext, cc_args, extra_postargs, pp_opts)
+            if not (self.force or
+                    newer_group([src] + (depends or []), obj, missing='newer')
+                    or self._read_compile_record(obj) !=
+                    self._get_compile_record(cc_args, extra_postargs)):
+                log.debug("skipping %s (%s up-to-date)", src, obj)
+                continue
+            jobs.append((obj, src, ext))
+
+        num_jobs = min(len(jobs), self._get_num_compile_jobs())
+        if num_jobs <= 1:
+            for obj, src, ext in jobs:
+                self._compile_recorded(obj, src, ext, cc_args, extra_postargs,
+                                       pp_opts)
+        else:
+            self._compile_parallel(jobs, num_jobs, cc_args, extra_postargs,
+                                   pp_opts)
 
         # Return *all* object filenames, not just the ones we just built.
         return objects
 
+    # Nuitka-Python: Objects are only reused if they are newer than their
+    # sources and were compiled with the same options, which are recorded in
+    # a file next to them.
+
+    def _get_compile_record(self, cc_args, extra_postargs):
+        return [getattr(self, 'compiler_so', None), cc_args, extra_postargs]
+
+    def _read_compile_record(self, obj):
+        import json
+
+        try:
+            with open(obj + '.args') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _compile_recorded(self, obj, src, ext, cc_args, extra_postargs,
+                          pp_opts):
+        import json
+
+        # A failed or interrupted compile must not leave a matching record.
+        if os.path.exists(obj + '.args'):
+            os.unlink(obj + '.args')
+        self._compile(obj, src, ext, cc_args, extra_postargs, pp_opts)
+        if not self.dry_run:
+            with open(obj + '.args', 'w') as f:
+                json.dump(self._get_compile_record(cc_args, extra_postargs), f)
+
+    def _get_num_compile_jobs(self):
+        """Return how many objects may be compiled at the same time.
+
+        Nuitka-Python: Follows the job count of the package build scripts,
+        i.e. the NUM_JOBS environment variable or the CPU count.
+        """
+        import __np__
+
+        try:
+            return max(1, int(__np__.get_num_jobs()))
+        except (TypeError, ValueError):
+            return 1
+
+    def _compile_parallel(self, jobs, num_jobs, cc_args, extra_postargs,
+                          pp_opts):
+        """Run '_compile()' for the (obj, src, ext) 'jobs' on 'num_jobs'
+        threads.  Errors are reported in source order: the first failing
+        object in 'jobs' determines the raised exception, and objects not
+        yet started are not compiled anymore.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        error = None
+        with ThreadPoolExecutor(max_workers=num_jobs) as executor:
+            futures = [executor.submit(self._compile_recorded, obj, src, ext,
+                                       cc_args, extra_postargs, pp_opts)
+                       for obj, src, ext in jobs]
+            for future in futures:
+                if error is not None:
+                    future.cancel()
+                    continue
+                try:
+                    future.result()
+                except BaseException as e:
+                    error = e
+        if error is not None:
+            raise error
+
     def _compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts):
         """Compile 'src' to product 'obj'."""
         # A concrete compiler class that does not override compile()
@@ -611,7 +611,7 @@ def run(self):
                        self.install_lib)
         
         if self.config_vars['dist_name'] != "Python":
-            rebuildpython.run_rebuild()
+            rebuildpython.request_rebuild()
 
     def create_path_file(self):
         """Creates the .pth file"""
@@ -1,6 +1,10 @@
 """Tests for distutils.unixccompiler."""
+import os
+import shutil
 import sys
+import threading
 import unittest
+from test.support import os_helper
 from test.support.os_helper import EnvironmentVarGuard
 
 from distutils import sysconfig
@@ -136,6 +140,142 @@ def gcv(v):
             sysconfig.customize_compiler(self.cc)
         self.assertEqual(self.cc.linker_so[0], 'my_ld')
 
+    def _make_sources(self, tmpdir, count):
+        sources = []
+        for i in range(count):
+            source = os.path.join(tmpdir, 'src%d.c' % i)
+            with open(source, 'w') as f:
+                f.write('int f%d(void) { return %d; }\n' % (i, i))
+            sources.append(source)
+        return sources
+
+    def test_compile_parallel(self):
+        compiled = []
+        barrier = threading.Barrier(2, timeout=10)
+
+        class RecordingCompiler(UnixCCompiler):
+            def _get_num_compile_jobs(self):
+                return 2
+
+            def _compile(self, obj, src, ext, cc_args, extra_postargs,
+                         pp_opts):
+                # Two compiles must run at the same time to pass the barrier.
+                barrier.wait()
+                compiled.append(src)
+
+        with os_helper.temp_dir() as tmpdir:
+            sources = self._make_sources(tmpdir, 4)
+            objects = RecordingCompiler().compile(sources, output_dir=tmpdir)
+
+        self.assertEqual(sorted(compiled), sorted(sources))
+        self.assertEqual(len(objects), 4)
+
+    def test_compile_parallel_error_order(self):
+        from distutils.errors import CompileError
+
+        class FailingCompiler(UnixCCompiler):
+            def _get_num_compile_jobs(self):
+                return 4
+
+            def _compile(self, obj, src, ext, cc_args, extra_postargs,
+                         pp_opts):
+                if not src.endswith('src0.c'):
+                    raise CompileError(src)
+
+        with os_helper.temp_dir() as tmpdir:
+            sources = self._make_sources(tmpdir, 4)
+            with self.assertRaises(CompileError) as cm:
+                FailingCompiler().compile(sources, output_dir=tmpdir)
+
+        self.assertEqual(str(cm.exception), sources[1])
+
+    def test_compile_skips_up_to_date_objects(self):
+        compiled = []
+
+        class RecordingCompiler(UnixCCompiler):
+            def _compile(self, obj, src, ext, cc_args, extra_postargs,
+                         pp_opts):
+                compiled.append(src)
+                with open(obj, 'w'):
+                    pass
+
+        with os_helper.temp_dir() as tmpdir:
+            sources = self._make_sources(tmpdir, 2)
+            header = os.path.join(tmpdir, 'dep.h')
+            with open(header, 'w'):
+                pass
+            objects = RecordingCompiler().compile(sources, output_dir=tmpdir)
+            self.assertEqual(len(compiled), 2)
+
+            # Nothing changed, nothing is compiled again.
+            RecordingCompiler().compile(sources, output_dir=tmpdir,
+                                        depends=[header])
+            self.assertEqual(len(compiled), 2)
+
+            # A changed dependency compiles everything again.
+            os.utime(header, (os.stat(objects[0]).st_mtime + 10,) * 2)
+            RecordingCompiler().compile(sources, output_dir=tmpdir,
+                                        depends=[header])
+            self.assertEqual(len(compiled), 4)
+
+            # Unless forced.
+            RecordingCompiler(force=1).compile(sources, output_dir=tmpdir)
+            self.assertEqual(len(compiled), 6)
+
+            # Changed macros compile everything again, once.
+            RecordingCompiler().compile(sources, output_dir=tmpdir,
+                                        macros=[('DEBUG', '1')])
+            self.assertEqual(len(compiled), 8)
+            RecordingCompiler().compile(sources, output_dir=tmpdir,
+                                        macros=[('DEBUG', '1')])
+            self.assertEqual(len(compiled), 8)
+
+            # As do changed extra arguments.
+            RecordingCompiler().compile(sources, output_dir=tmpdir,
+                                        macros=[('DEBUG', '1')],
+                                        extra_postargs=['-O0'])
+            self.assertEqual(len(compiled), 10)
+
+    @unittest.skipUnless(shutil.which('cc'), 'requires a C compiler')
+    def test_object_cache(self):
+        from distutils.unixccompiler import get_object_cache
+
+        with os_helper.temp_dir() as tmpdir:
+            cache_dir = os.path.join(tmpdir, 'cache')
+            sources = self._make_sources(tmpdir, 1)
+            with EnvironmentVarGuard() as env:
+                env['NUITKA_PYTHON_OBJECT_CACHE'] = cache_dir
+                cc = UnixCCompiler()
+                cc.set_executables(compiler_so='cc')
+                first = cc.compile(sources, output_dir=os.path.join(tmpdir, 'a'))
+                second = cc.compile(sources, output_dir=os.path.join(tmpdir, 'b'))
+                stats = get_object_cache().get_stats()
+
+            with open(first[0], 'rb') as f1, open(second[0], 'rb') as f2:
+                self.assertEqual(f1.read(), f2.read())
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_object_cache_eviction(self):
+        from distutils.unixccompiler import ObjectCache
+
+        with os_helper.temp_dir() as tmpdir:
+            cache = ObjectCache(os.path.join(tmpdir, 'cache'), max_size=250)
+            obj = os.path.join(tmpdir, 'obj.o')
+            for i, key in enumerate(['aa01', 'bb02', 'cc03']):
+                with open(obj, 'wb') as f:
+                    f.write(b'x' * 100)
+                cache.store(key, obj)
+                filename = cache._get_filename(key)
+                os.utime(filename, (i, i))
+                if i == 0:
+                    # The first object is used again, the second is older.
+                    os.utime(filename, (5, 5))
+
+            self.assertTrue(cache.fetch('aa01', obj))
+            self.assertFalse(cache.fetch('bb02', obj))
+            self.assertEqual(cache.get_stats()['evictions'], 1)
+
 
 if __name__ == "__main__":
     unittest.main()
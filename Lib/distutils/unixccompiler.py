@@ -14,6 +14,7 @@
 """
 
 import os, sys, re
+import hashlib, json, shutil, subprocess, threading
 
 from distutils import sysconfig
 from distutils.dep_util import newer
@@ -42,6 +43,228 @@
 #     options and carry on.
 
 
+class ObjectCache:
+    """Content addressed cache of compiled object files.
+
+    Nuitka-Python: Enabled by pointing the NUITKA_PYTHON_OBJECT_CACHE
+    environment variable at a directory.  Objects are keyed by the
+    preprocessed source, the compiler command line and the compiler version,
+    so identical compiles of a package are served from the cache across
+    builds.  The least recently used objects are evicted once the cache
+    exceeds NUITKA_PYTHON_OBJECT_CACHE_SIZE bytes (default 5 GiB).  Hit and
+    miss counts are kept in "stats.json" in the cache directory.
+    """
+
+    default_max_size = 5 * 1024 ** 3
+
+    # Line markers carry the absolute path of the (temporary) build directory.
+    _line_marker_re = re.compile(rb'^#(?: \d+| line \d+)[^\n]*\n?', re.M)
+
+    def __init__(self, cache_dir, max_size=None):
+        self.cache_dir = cache_dir
+        self.max_size = self.default_max_size if max_size is None else max_size
+        self._lock = threading.Lock()
+        self._compiler_versions = {}
+        # Approximate size of the cache, only measured again when crossing
+        # the limit, None until the first store measures it.
+        self._size = None
+
+    def _get_compiler_version(self, compiler):
+        with self._lock:
+            if compiler not in self._compiler_versions:
+                try:
+                    version = subprocess.run(
+                        [compiler, '--version'], stdout=subprocess.PIPE,
+                        stderr=subprocess.STDOUT, check=True).stdout
+                except (OSError, subprocess.CalledProcessError):
+                    version = None
+                self._compiler_versions[compiler] = version
+            return self._compiler_versions[compiler]
+
+    def get_key(self, compiler_so, cc_args, src, extra_postargs):
+        """Return the cache key for compiling 'src', or None if the source
+        cannot be preprocessed, in which case the compile is not cached."""
+        version = self._get_compiler_version(compiler_so[0])
+        if version is None:
+            return None
+
+        pp_args = [('-E' if arg == '-c' else arg) for arg in cc_args]
+        try:
+            preprocessed = subprocess.run(
+                compiler_so + pp_args + [src] + extra_postargs,
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+        # Without debug information, the source location does not end up in
+        # the object, so allow hits across build directories.
+        if not self._has_debug_info(compiler_so + cc_args + extra_postargs):
+            preprocessed = self._line_marker_re.sub(b'', preprocessed)
+
+        # The preprocessor options are reflected by the preprocessed source,
+        # and carry paths of the build, which must not prevent hits.
+        key = hashlib.sha256(version)
+        key.update(json.dumps(
+            [self._strip_preprocessor_args(args)
+             for args in (compiler_so, cc_args, extra_postargs)] +
+            [os.path.splitext(src)[1]]).encode('utf-8'))
+        key.update(preprocessed)
+        return key.hexdigest()
+
+    _pp_options = ('-I', '-D', '-U')
+    _pp_options_with_value = ('-isystem', '-iquote', '-idirafter', '-include')
+
+    @classmethod
+    def _strip_preprocessor_args(cls, args):
+        result = []
+        skip_next = False
+        for arg in args:
+            if skip_next:
+                skip_next = False
+            elif arg in cls._pp_options or arg in cls._pp_options_with_value:
+                skip_next = True
+            elif not arg.startswith(cls._pp_options + cls._pp_options_with_value):
+                result.append(arg)
+        return result
+
+    @staticmethod
+    def _has_debug_info(args):
+        return any(arg.startswith('-g') and arg != '-g0' for arg in args)
+
+    def _get_filename(self, key):
+        return os.path.join(self.cache_dir, key[:2], key[2:] + '.o')
+
+    def fetch(self, key, obj):
+        """Copy a cached object to 'obj', return whether it was a hit."""
+        filename = self._get_filename(key)
+        try:
+            shutil.copyfile(filename, obj)
+            # Mark as recently used for the eviction.
+            os.utime(filename)
+        except OSError:
+            self._count('misses')
+            return False
+
+        self._count('hits')
+        log.info("using cached object for %s", obj)
+        return True
+
+    def store(self, key, obj):
+        """Copy 'obj' into the cache, failing to do so is not an error."""
+        filename = self._get_filename(key)
+
+        # Write under a temporary name, concurrent builds may store the same key.
+        tmp_filename = '%s.%d.%d.tmp' % (filename, os.getpid(),
+                                         threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            shutil.copyfile(obj, tmp_filename)
+            os.replace(tmp_filename, filename)
+            size = os.path.getsize(filename)
+        except OSError as e:
+            log.warn("cannot store %s in object cache: %s", obj, e)
+            try:
+                os.unlink(tmp_filename)
+            except OSError:
+                pass
+            return
+
+        # Only list the whole cache when it might have grown over the limit.
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+                if self._size <= self.max_size:
+                    return
+        try:
+            total_size = self._evict()
+        except OSError as e:
+            log.warn("cannot evict from object cache: %s", e)
+        else:
+            with self._lock:
+                self._size = total_size
+
+    def _evict(self):
+        """Evict the least recently used objects if the cache is too large,
+        return its size afterwards."""
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as sub_dirs:
+            for sub_dir in sub_dirs:
+                if not sub_dir.is_dir():
+                    continue
+                with os.scandir(sub_dir.path) as cached_objects:
+                    for cached_object in cached_objects:
+                        try:
+                            st = cached_object.stat()
+                        except OSError:
+                            # Evicted by a concurrent build meanwhile.
+                            continue
+                        entries.append((st.st_mtime, st.st_size,
+                                        cached_object.path))
+                        total_size += st.st_size
+
+        if total_size <= self.max_size:
+            return total_size
+
+        # Evict down to 90% of the limit, to not evict on every store.
+        evicted = 0
+        for _mtime, size, path in sorted(entries):
+            if total_size <= self.max_size * 0.9:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total_size -= size
+            evicted += 1
+        self._count('evictions', evicted)
+        return total_size
+
+    def _count(self, counter, amount=1):
+        stats_filename = os.path.join(self.cache_dir, 'stats.json')
+        tmp_filename = '%s.%d.%d.tmp' % (stats_filename, os.getpid(),
+                                         threading.get_ident())
+        with self._lock:
+            stats = self.get_stats()
+            stats[counter] = stats.get(counter, 0) + amount
+            # Readers never see a partially written file. Concurrent builds
+            # may lose some counts, the statistics are only informative.
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(tmp_filename, 'w') as f:
+                    json.dump(stats, f)
+                os.replace(tmp_filename, stats_filename)
+            except OSError:
+                try:
+                    os.unlink(tmp_filename)
+                except OSError:
+                    pass
+
+    def get_stats(self):
+        """Return the hit/miss/eviction counters of the cache."""
+        try:
+            with open(os.path.join(self.cache_dir, 'stats.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+_object_caches = {}
+
+def get_object_cache():
+    """Return the ObjectCache configured by the environment, or None."""
+    cache_dir = os.environ.get('NUITKA_PYTHON_OBJECT_CACHE')
+    if not cache_dir:
+        return None
+
+    max_size = os.environ.get('NUITKA_PYTHON_OBJECT_CACHE_SIZE')
+    max_size = int(max_size) if max_size else None
+    if (cache_dir, max_size) not in _object_caches:
+        _object_caches[cache_dir, max_size] = ObjectCache(cache_dir, max_size)
+    return _object_caches[cache_dir, max_size]
+
+
 class UnixCCompiler(CCompiler):
 
     compiler_type = 'unix'
@@ -120,12 +343,24 @@ def _compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts):
         if sys.platform == 'darwin':
             compiler_so = _osx_support.compiler_fixup(compiler_so,
                                                     cc_args + extra_postargs)
+
+        object_cache = None if self.dry_run else get_object_cache()
+        cache_key = None
+        if object_cache is not None:
+            cache_key = object_cache.get_key(compiler_so, cc_args, src,
+                                             extra_postargs)
+            if cache_key is not None and object_cache.fetch(cache_key, obj):
+                return
+
         try:
             self.spawn(compiler_so + cc_args + [src, '-o', obj] +
                        extra_postargs)
         except DistutilsExecError as msg:
             raise CompileError(msg)
 
+        if cache_key is not None:
+            object_cache.store(cache_key, obj)
+
     def create_static_lib(self, objects, output_libname,
                           output_dir=None, debug=0, target_lang=None):
         objects, output_dir = self._fix_object_args(objects, output_dir)
@@ -19,19 +19,9 @@
 
 
 def download_file(url, destination) -> str:
-    with contextlib.closing(urllib.request.urlopen(url)) as fp:
-        if 'content-disposition' in fp.headers and 'filename=' in fp.headers['content-disposition']:
-            destination_file = os.path.join(destination, fp.headers['content-disposition'].split('filename=')[-1])
-        else:
-            destination_file = os.path.join(destination, pathlib.Path(fp.url).name)
-        with open(destination_file, 'wb') as out_file:
-            bs = 1024*8
-            while True:
-                block = fp.read(bs)
-                if not block:
-                    break
-                out_file.write(block)
-    return destination_file
+    import __np__.common
+
+    return __np__.common.download_file(url, destination)
 
 
 def extract_archive(archive_file: str, destination=None) -> str:
@@ -43,10 +33,10 @@ def extract_archive(archive_file: str, destination=None) -> str:
     return destination
 
 
-def download_extract(url: str, destination: str):
-    with tempfile.TemporaryDirectory() as dir:
-        downloaded_file = download_file(url, dir)
-        extract_archive(downloaded_file, destination)
+def download_extract(url: str, destination: str, cache_dir=None):
+    import __np__.common
+
+    __np__.common.download_extract(url, destination, cache_dir=cache_dir)
 
 
 def get_compiler_module() -> ModuleType:
@@ -81,17 +71,10 @@ def setup_compiler_env():
     os.environ.update(vc_env)
 
 
-def run_with_output(*args: str) -> str:
-    p = subprocess.Popen(args, universal_newlines=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    output = ""
-    for line in p.stdout:
-        sys.stdout.write(line)
-        sys.stdout.flush()
-        output += line
-    p.wait()
-    if p.returncode != 0:
-        raise subprocess.CalledProcessError(p.returncode, args, output)
-    return output
+def run_with_output(*args: str, **kwargs) -> str:
+    import __np__.common
+
+    return __np__.common.run_with_output(*args, **kwargs)
 
 
 def run_compiler_exe(exe: str, *args: str):
@@ -162,30 +145,20 @@ def is_file_binary(file_path: str) -> bool:
         return bool(f.read(1024).translate(None, textchars))
 
 
+def _patch_MD_MT(fpath: str, s: str, cmake_setup: str = "") -> str:
+    s2 = s.replace("/MD", "/MT")
+    s2 = s2.replace("-MD", "-MT")
+    if fpath.endswith('CMakeLists.txt'):
+        s2 = re.sub(r"cmake_minimum_required *\( *VERSION [0-9\.]+ *\)", lambda match: "cmake_minimum_required(VERSION 3.15)" + cmake_setup, s2, flags=re.IGNORECASE)
+        s2 = re.sub(r"cmake_policy\(VERSION [0-9\.]+\)", "", s2, flags=re.IGNORECASE)
+    return s2
+
+
+_MD_MT_pattern = re.compile(rb"[/-]MD|(?i:cmake_(?:minimum_required|policy))")
+
+
 def auto_patch_MD_MT(folder):
-    for dname, dirs, files in os.walk(folder):
-        for fname in files:
-            fpath = os.path.join(dname, fname)
-            if '.git' in fpath or '.svn' in fpath:
-                continue
-
-            if fname.endswith('CMakeLists.txt'):
-                with open(fpath, 'r') as f:
-                    s = f.read()
-                s2 = s.replace("/MD", "/MT")
-                s2 = s2.replace("-MD", "-MT")
-                s2 = re.sub(r"cmake_minimum_required *\( *VERSION [0-9\.]+ *\)", "cmake_minimum_required(VERSION 3.15)", s2, flags=re.IGNORECASE)
-                s2 = re.sub(r"cmake_policy\(VERSION [0-9\.]+\)", "", s2, flags=re.IGNORECASE)
-                if s != s2:
-                    print("Fixed up file:", fpath)
-                    with open(fpath, "w") as f:
-                        f.write(s2)
-            elif not is_file_binary(fpath):
-                with open(fpath, 'r') as f:
-                    s = f.read()
-                s2 = s.replace("/MD", "/MT")
-                s2 = s2.replace("-MD", "-MT")
-                if s != s2:
-                    print("Fixed up file:", fpath)
-                    with open(fpath, "w") as f:
-                        f.write(s2)
+    import __np__.common
+
+    for fpath in __np__.common.rewrite_tree(folder, _MD_MT_pattern, _patch_MD_MT):
+        print("Fixed up file:", fpath)
@@ -1,3 +1,4 @@
+import contextlib
 import fnmatch
 import json
 import os
@@ -23,8 +24,10 @@
 sys.modules["pip"] = _pip
 
 
-def urlretrieve(url, output_filename):
-    local_filename = __np__.download_file(url, os.path.dirname(output_filename))
+def urlretrieve(url, output_filename, expected_hash=None):
+    local_filename = __np__.download_file(
+        url, os.path.dirname(output_filename), expected_hash=expected_hash
+    )
 
     return local_filename
 
@@ -98,6 +101,21 @@ def _importFilePy3NewWay(modulename, filename):
     "https://raw.githubusercontent.com/Nuitka/Nuitka-Python-packages/master",
 )
 
+# A local checkout of the packages repository can be used as a mirror directly.
+if os.path.isdir(PACKAGE_BASE_URL):
+    import pathlib
+
+    PACKAGE_BASE_URL = pathlib.Path(os.path.abspath(PACKAGE_BASE_URL)).as_uri()
+
+# Recipe indexes are cached on disk and only revalidated with the server after
+# the TTL in seconds expired. In offline mode, only the cache is used.
+PACKAGE_CACHE_DIR = os.environ.get(
+    "NUITKA_PYTHON_PACKAGE_CACHE",
+    os.path.join(sysconfig.get_config_var("prefix"), "package_cache"),
+)
+PACKAGE_CACHE_TTL = int(os.environ.get("NUITKA_PYTHON_PACKAGE_CACHE_TTL", 3600))
+PACKAGE_OFFLINE = os.environ.get("NUITKA_PYTHON_OFFLINE", "0") == "1"
+
 
 def getPackageUrl(section, name):
     if platform.system() == "Windows":
@@ -121,133 +139,586 @@ def getPackageUrl(section, name):
     )
 
 
+def _loadCachedJson(url):
+    if url.startswith("file:"):
+        from urllib.parse import urlparse
+        from urllib.request import url2pathname
+
+        try:
+            with open(url2pathname(urlparse(url).path)) as data_file:
+                return json.load(data_file)
+        except FileNotFoundError:
+            raise __np__.NoSuchURL(url)
+
+    import hashlib
+    import time
+    from urllib.request import HTTPError, Request, URLError, urlopen
+
+    cache_filename = os.path.join(
+        PACKAGE_CACHE_DIR, hashlib.sha256(url.encode("utf8")).hexdigest() + ".json"
+    )
+    try:
+        with open(cache_filename) as cache_file:
+            cache_entry = json.load(cache_file)
+    except (OSError, ValueError):
+        cache_entry = None
+
+    if cache_entry is not None and (
+        PACKAGE_OFFLINE or time.time() - cache_entry["fetched"] < PACKAGE_CACHE_TTL
+    ):
+        pass
+    elif PACKAGE_OFFLINE:
+        # Without a cache entry, it is unknown whether there is a recipe, so
+        # do not let that fall back to a source install silently.
+        raise __np__.NotCachedOffline(url)
+    else:
+        headers = {"User-Agent": "Nuitka-Python"}
+        if cache_entry is not None and cache_entry.get("etag"):
+            headers["If-None-Match"] = cache_entry["etag"]
+        if cache_entry is not None and cache_entry.get("last_modified"):
+            headers["If-Modified-Since"] = cache_entry["last_modified"]
+
+        revalidated = True
+        try:
+            with urlopen(Request(url, headers=headers)) as response:
+                cache_entry = {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "missing": False,
+                    "data": json.loads(response.read().decode("utf8")),
+                }
+        except HTTPError as e:
+            if e.code == 304 and cache_entry is not None:
+                pass
+            elif e.code == 404:
+                cache_entry = {"url": url, "missing": True}
+            else:
+                raise
+        except URLError as e:
+            if cache_entry is None:
+                raise
+            __np__.my_print(
+                "Using cached '%s', cannot revalidate: %s" % (url, e.reason),
+                style="yellow",
+            )
+            revalidated = False
+
+        if revalidated:
+            cache_entry["fetched"] = time.time()
+
+            os.makedirs(PACKAGE_CACHE_DIR, exist_ok=True)
+            tmp_filename = "%s.%d.tmp" % (cache_filename, os.getpid())
+            with open(tmp_filename, "w") as cache_file:
+                json.dump(cache_entry, cache_file)
+            os.replace(tmp_filename, cache_filename)
+
+    if cache_entry["missing"]:
+        raise __np__.NoSuchURL(url)
+
+    return cache_entry["data"]
+
+
+# Indexes already loaded by this process, or the NoSuchURL raised for them.
+_package_json_cache = {}
+
+
 def getPackageJson(section, name):
-    package_dir_url = getPackageUrl(section, name)
-    with __np__.TemporaryDirectory() as temp_dir:
-        data_filename = urlretrieve(
-            "{package_dir_url}/index.json".format(**locals()),
-            os.path.join(temp_dir, "index.json"),
-        )
+    if (section, name) not in _package_json_cache:
+        package_dir_url = getPackageUrl(section, name)
+        try:
+            _package_json_cache[section, name] = _loadCachedJson(
+                "{package_dir_url}/index.json".format(**locals())
+            )
+        except __np__.NoSuchURL as e:
+            _package_json_cache[section, name] = e
 
-        with open(data_filename) as data_file:
-            return json.loads(data_file.read())
+    result = _package_json_cache[section, name]
+    if isinstance(result, __np__.NoSuchURL):
+        raise result
+
+    return result
 
 
 def getBuildScriptName(dir_name, name):
     return "build_script_" + os.path.basename(dir_name).replace("-", "_") + "_" + name
 
 
-def install_build_tool(name):
-    package_index = getPackageJson("build_tools", name)
-    package_dir_url = getPackageUrl("build_tools", name)
+_recipe_kinds = {"build_tools": "build tool", "dependencies": "dependency"}
 
-    if "build_tools" in package_index:
-        for tool in package_index["build_tools"]:
-            install_build_tool(tool)
 
-    if os.path.isfile(
-        os.path.join(__np__.getToolsInstallDir(), name, "version.txt")
-    ):
-        with open(
-            os.path.join(__np__.getToolsInstallDir(), name, "version.txt"), "r"
-        ) as f:
-            version = f.read()
-            if version == package_index["version"]:
-                print("Skipping installed build tool {name}.".format(**locals()))
-                return
-
-    print("Setting up build tool {name}...".format(**locals()))
-
-    with __np__.TemporaryDirectory() as temp_dir:
-        for file in package_index["files"]:
-            urlretrieve(
-                "{package_dir_url}/{file}".format(**locals()),
-                os.path.join(temp_dir, file),
-            )
+def _getRecipeInstallDir(section, name):
+    if section == "build_tools":
+        return os.path.join(__np__.getToolsInstallDir(), name)
+    else:
+        return os.path.join(__np__.getDependencyInstallDir(), name)
 
-        build_script_module_name = getBuildScriptName(temp_dir, name)
-        initcwd = os.getcwd()
-        initenviron = dict(os.environ)
 
-        build_script_module = importFileAsModule(
-            build_script_module_name,
-            os.path.join(temp_dir, package_index["build_script"]),
-        )
+def _isRecipeInstalled(section, name, package_index):
+    version_filename = os.path.join(_getRecipeInstallDir(section, name), "version.txt")
+    if os.path.isfile(version_filename):
+        with open(version_filename, "r") as f:
+            return f.read() == package_index["version"]
+
+    return False
+
+
+def resolveRecipeGraph(roots):
+    """Resolve build tools and dependencies of recipes up front.
+
+    Args:
+        roots: list of (section, name) tuples, with section being
+               "build_tools" or "dependencies"
+
+    Returns:
+        Tuple of the recipe nodes in a topological order, i.e. prerequisites
+        first, and a dictionary of each node to its direct prerequisites.
+    """
+    prerequisites = {}
+    order = []
+    visiting = set()
+
+    def visit(node):
+        if node in prerequisites:
+            return
+        if node in visiting:
+            raise RuntimeError("Error, recipe cycle involving %s '%s'." % node)
+        visiting.add(node)
+
+        section, name = node
+        package_index = getPackageJson(section, name)
+
+        # Build tools only have build tools of their own as prerequisites.
+        node_prerequisites = [("build_tools", tool) for tool in package_index.get("build_tools", ())]
+        if section == "dependencies":
+            node_prerequisites += [("dependencies", dep) for dep in package_index.get("dependencies", ())]
+
+        for prerequisite in node_prerequisites:
+            visit(prerequisite)
+
+        visiting.discard(node)
+        prerequisites[node] = node_prerequisites
+        order.append(node)
+
+    for root in roots:
+        visit(root)
+
+    return order, prerequisites
+
+
+# Built build tools and dependencies are shared as tarballs in this directory.
+BINARY_CACHE_DIR = os.environ.get("NUITKA_PYTHON_BINARY_CACHE")
+
+_compiler_version = None
+
+
+def _getCompilerVersion():
+    global _compiler_version  # singleton, pylint: disable=global-statement
+
+    if _compiler_version is None:
+        import subprocess
+
+        if platform.system() == "Windows":
+            _compiler_version = str(__np__.get_vs_version())
+        else:
+            compiler = (sysconfig.get_config_var("CC") or "cc").split()[0]
+            _compiler_version = subprocess.run(
+                [compiler, "--version"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+            ).stdout
+
+    return _compiler_version
+
+
+def getRecipeBinaryFilename(section, name, package_index):
+    """Content addressed tarball name for a build of a recipe.
+
+    The key covers the recipe version, the keys of its prerequisites and the
+    toolchain and flags it would be built with, so incompatible builds never
+    share an entry.
+    """
+    import hashlib
+
+    prerequisites = [("build_tools", tool) for tool in package_index.get("build_tools", ())]
+    if section == "dependencies":
+        prerequisites += [("dependencies", dep) for dep in package_index.get("dependencies", ())]
+
+    key_data = {
+        "section": section,
+        "name": name,
+        "version": package_index["version"],
+        # Not the kernel release, which changes without affecting the builds.
+        "platform": sysconfig.get_platform(),
+        "libc": platform.libc_ver(),
+        "machine": platform.machine(),
+        "python": sys.version_info[:2],
+        "compiler": _getCompilerVersion(),
+        "prerequisites": [
+            os.path.basename(getRecipeBinaryFilename(*prerequisite, getPackageJson(*prerequisite)))
+            for prerequisite in prerequisites
+        ],
+    }
+    for var in ("CC", "CXX", "CFLAGS", "CXXFLAGS", "LDFLAGS"):
+        key_data[var] = os.environ.get(var, sysconfig.get_config_var(var))
+
+    key = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf8")).hexdigest()
+
+    return os.path.join(
+        BINARY_CACHE_DIR,
+        "{name}-{version}-{key}.tar.gz".format(name=name, version=package_index["version"], key=key),
+    )
+
+
+def importRecipeBinary(section, name, package_index):
+    """Install a recipe from the binary cache, returns if it was found there."""
+    import tarfile
+
+    if not BINARY_CACHE_DIR:
+        return False
+
+    binary_filename = getRecipeBinaryFilename(section, name, package_index)
+    if not os.path.isfile(binary_filename):
+        return False
+
+    install_dir = _getRecipeInstallDir(section, name)
+    if os.path.isdir(install_dir):
+        import shutil
+
+        shutil.rmtree(install_dir)
+
+    with tarfile.open(binary_filename, "r:gz") as archive:
+        # The cache directory may be shared, so only let entries write below
+        # the install directory of this recipe.
+        for member in archive.getmembers():
+            if member.name != name and not member.name.startswith(name + "/"):
+                raise tarfile.OutsideDestinationError(
+                    member, os.path.join(os.path.dirname(install_dir), member.name)
+                )
+
+        archive.extractall(os.path.dirname(install_dir), filter="data")
+
+    return True
+
+
+def exportRecipeBinary(section, name, package_index):
+    import tarfile
+
+    if not BINARY_CACHE_DIR:
+        return
+
+    binary_filename = getRecipeBinaryFilename(section, name, package_index)
+    os.makedirs(BINARY_CACHE_DIR, exist_ok=True)
+
+    # Concurrent agents may export the same build, only complete files get visible.
+    tmp_filename = "%s.%d.tmp" % (binary_filename, os.getpid())
+    with tarfile.open(tmp_filename, "w:gz") as archive:
+        archive.add(_getRecipeInstallDir(section, name), arcname=name)
+    os.replace(tmp_filename, binary_filename)
+
+
+# Per package build timing and memory records are written as JSON files to
+# this directory, and summarized at the end of the pip run.
+TELEMETRY_DIR = os.environ.get("NUITKA_PYTHON_BUILD_TELEMETRY")
+
+_telemetry_records = []
+
+
+def getPeakRss(*whos):
+    """Peak resident set size in KiB of this process or its children, if known."""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    maxrss = max(resource.getrusage(getattr(resource, who)).ru_maxrss for who in whos)
+    # Linux reports KiB, macOS bytes.
+    return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+
+class BuildTelemetry(object):
+    """Collects the phase timings of building one package."""
+
+    def __init__(self, kind, name, version=None):
+        import time
+
+        self.record = {
+            "kind": kind,
+            "name": name,
+            "version": version,
+            "start": time.time(),
+            "phases": {},
+            "commands": [],
+            "peak_rss_kb": None,
+        }
+        self.step_index = len(__np__.get_step_timings())
+
+    @contextlib.contextmanager
+    def phase(self, phase):
+        import time
+
+        start = time.perf_counter()
         try:
-            build_script_module.run(temp_dir)
+            yield
         finally:
-            if build_script_module_name in sys.modules:
-                del sys.modules[build_script_module_name]
-            try:
-                del build_script_module
-            except NameError:
-                pass
-            os.chdir(initcwd)
-            os.environ.clear()
-            os.environ.update(initenviron)
+            phases = self.record["phases"]
+            phases[phase] = phases.get(phase, 0) + time.perf_counter() - start
+
+    def addChildReport(self, report_filename):
+        """Merge the report a build process wrote, see _build_script_runner."""
+        try:
+            with open(report_filename) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        self.record["commands"] += report["commands"]
+        self.record["peak_rss_kb"] = report["peak_rss_kb"]
+
+    def finish(self, success):
+        import time
+
+        self.record["success"] = success
+        self.record["duration"] = time.time() - self.record["start"]
+        self.record["commands"] += __np__.get_step_timings()[self.step_index:]
+        if self.record["peak_rss_kb"] is None:
+            # In process builds, this is the high water mark of the pip run so far.
+            self.record["peak_rss_kb"] = getPeakRss("RUSAGE_SELF", "RUSAGE_CHILDREN")
+
+        _telemetry_records.append(self.record)
+
+        if TELEMETRY_DIR:
+            os.makedirs(TELEMETRY_DIR, exist_ok=True)
+            filename = os.path.join(
+                TELEMETRY_DIR,
+                "{kind}-{name}-{start}-{pid}.json".format(
+                    kind=self.record["kind"].replace(" ", "_"),
+                    name=self.record["name"],
+                    start=int(self.record["start"]),
+                    pid=os.getpid(),
+                ),
+            )
+            with open(filename, "w") as f:
+                json.dump(self.record, f, indent=2)
+
+    @classmethod
+    @contextlib.contextmanager
+    def measure(cls, kind, name, version=None):
+        telemetry = cls(kind, name, version)
+        success = False
+        try:
+            yield telemetry
+            success = True
+        finally:
+            telemetry.finish(success)
+
+
+def printTelemetrySummary():
+    if not TELEMETRY_DIR or not _telemetry_records:
+        return
+
+    __np__.my_print("Build telemetry summary, records in '%s':" % TELEMETRY_DIR, style="blue")
+    for record in sorted(_telemetry_records, key=lambda record: -record["duration"]):
+        print(
+            "{duration:9.1f}s {peak_rss:>10} {kind:<14} {name}{failed}: {phases}".format(
+                duration=record["duration"],
+                peak_rss="%d MiB" % (record["peak_rss_kb"] // 1024)
+                if record["peak_rss_kb"] is not None
+                else "?",
+                kind=record["kind"],
+                name=record["name"],
+                failed="" if record["success"] else " (failed)",
+                phases=", ".join(
+                    "%s %.1fs" % item for item in sorted(record["phases"].items())
+                ),
+            )
+        )
+
+    commands = [
+        (command, record["name"])
+        for record in _telemetry_records
+        for command in record["commands"]
+    ]
+    if commands:
+        print("Slowest build commands:")
+        for command, name in sorted(commands, key=lambda item: -item[0]["duration"])[:10]:
+            print(
+                "{duration:9.1f}s {name}: {step}".format(
+                    duration=command["duration"], name=name, step=command["step"]
+                )
+            )
+
+
+def getBuildWorkerCount():
+    return max(1, int(os.environ.get("NUITKA_PYTHON_BUILD_WORKERS", min(4, os.cpu_count() or 1))))
+
+
+# Runs a build script in a fresh process, so it gets its own environment and working directory.
+# It reports its command timings and peak memory usage for the telemetry.
+_build_script_runner = """
+import importlib.util, json, sys
+import __np__
+build_script, temp_dir, module_name, report_filename = sys.argv[1:]
+try:
+    spec = importlib.util.spec_from_file_location(module_name, build_script)
+    build_script_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(build_script_module)
+    build_script_module.run(temp_dir)
+finally:
+    try:
+        import resource
+        peak_rss_kb = max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        ) // (1024 if sys.platform == "darwin" else 1)
+    except ImportError:
+        peak_rss_kb = None
+    with open(report_filename, "w") as f:
+        json.dump({"commands": __np__.get_step_timings(), "peak_rss_kb": peak_rss_kb}, f)
+"""
+
+
+def _runRecipeBuild(section, name, package_index, temp_dir, build_env, show_output, telemetry):
+    report_filename = os.path.join(temp_dir, ".build_report.json")
+    args = [
+        sys.executable,
+        "-c",
+        _build_script_runner,
+        os.path.join(temp_dir, package_index["build_script"]),
+        temp_dir,
+        getBuildScriptName(temp_dir, name),
+        report_filename,
+    ]
+
+    with telemetry.phase("build"):
+        _runBuildProcess(section, name, args, build_env, show_output)
+    telemetry.addChildReport(report_filename)
 
-    with open(
-        os.path.join(__np__.getToolsInstallDir(), name, "version.txt"), "w"
-    ) as f:
+    with open(os.path.join(_getRecipeInstallDir(section, name), "version.txt"), "w") as f:
         f.write(package_index["version"])
 
+    with telemetry.phase("binary_cache"):
+        exportRecipeBinary(section, name, package_index)
 
-def install_dependency(name):
-    package_index = getPackageJson("dependencies", name)
-    package_dir_url = getPackageUrl("dependencies", name)
-
-    if "build_tools" in package_index:
-        for tool in package_index["build_tools"]:
-            install_build_tool(tool)
-    if "dependencies" in package_index:
-        for dep in package_index["dependencies"]:
-            install_dependency(dep)
-
-    if os.path.isfile(
-        os.path.join(__np__.getDependencyInstallDir(), name, "version.txt")
-    ):
-        with open(
-            os.path.join(__np__.getDependencyInstallDir(), name, "version.txt"), "r"
-        ) as f:
-            version = f.read()
-            if version == package_index["version"]:
-                print("Skipping installed dependency {name}.".format(**locals()))
-                return
-
-    print("Compiling dependency {name}...".format(**locals()))
-
-    with __np__.TemporaryDirectory() as temp_dir:
-        for file in package_index["files"]:
-            urlretrieve(
-                "{package_dir_url}/{file}".format(**locals()),
-                os.path.join(temp_dir, file),
-            )
 
-        build_script_module_name = getBuildScriptName(temp_dir, name)
-        initcwd = os.getcwd()
-        initenviron = dict(os.environ)
+def _runBuildProcess(section, name, args, build_env, show_output):
+    import subprocess
 
-        build_script_module = importFileAsModule(
-            build_script_module_name,
-            os.path.join(temp_dir, package_index["build_script"]),
+    if show_output:
+        subprocess.check_call(args, env=build_env)
+    else:
+        # Keep the output of concurrent builds apart.
+        process = subprocess.run(
+            args,
+            env=build_env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
         )
-        try:
-            build_script_module.run(temp_dir)
-        finally:
-            if build_script_module_name in sys.modules:
-                del sys.modules[build_script_module_name]
-            try:
-                del build_script_module
-            except NameError:
-                pass
-            os.chdir(initcwd)
-            os.environ.clear()
-            os.environ.update(initenviron)
+        __np__.my_print(
+            "Output of building {kind} {name}:".format(kind=_recipe_kinds[section], name=name),
+            style="blue",
+        )
+        sys.stdout.write(process.stdout)
+        process.check_returncode()
 
-    with open(
-        os.path.join(__np__.getDependencyInstallDir(), name, "version.txt"), "w"
-    ) as f:
-        f.write(package_index["version"])
+
+def installRecipes(roots):
+    """Install build tools and dependencies with all their prerequisites.
+
+    Independent recipes are downloaded in parallel and built concurrently on
+    up to NUITKA_PYTHON_BUILD_WORKERS workers, each in its own process, that
+    share the NUM_JOBS budget.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    order, prerequisites = resolveRecipeGraph(roots)
+
+    to_build = []
+    for section, name in order:
+        package_index = getPackageJson(section, name)
+        if _isRecipeInstalled(section, name, package_index):
+            print("Skipping installed {kind} {name}.".format(kind=_recipe_kinds[section], name=name))
+        elif importRecipeBinary(section, name, package_index):
+            print("Installed {kind} {name} from binary cache.".format(kind=_recipe_kinds[section], name=name))
+        else:
+            to_build.append((section, name))
+
+    if not to_build:
+        return
+
+    workers = min(getBuildWorkerCount(), len(to_build))
+    build_env = dict(os.environ)
+    build_env["NUM_JOBS"] = str(max(1, int(__np__.get_num_jobs()) // workers))
+
+    with contextlib.ExitStack() as exit_stack, ThreadPoolExecutor(
+        max_workers=8
+    ) as download_pool, ThreadPoolExecutor(max_workers=workers) as build_pool:
+        downloads = {}
+        for section, name in to_build:
+            package_index = getPackageJson(section, name)
+            package_dir_url = getPackageUrl(section, name)
+            temp_dir = exit_stack.enter_context(__np__.TemporaryDirectory())
+
+            downloads[section, name] = (
+                temp_dir,
+                download_pool.submit(
+                    __np__.download_files,
+                    [
+                        (
+                            "{0}/{1}".format(package_dir_url, file),
+                            os.path.dirname(os.path.join(temp_dir, file)),
+                            package_index.get("hashes", {}).get(file),
+                        )
+                        for file in package_index["files"]
+                    ],
+                ),
+            )
+
+        def buildRecipe(section, name):
+            package_index = getPackageJson(section, name)
+            temp_dir, files_download = downloads[section, name]
+
+            with BuildTelemetry.measure(
+                _recipe_kinds[section], name, package_index["version"]
+            ) as telemetry:
+                # Downloads ran in the background, this is the time spent waiting for them.
+                with telemetry.phase("download"):
+                    files_download.result()
+
+                print("Building {kind} {name}...".format(kind=_recipe_kinds[section], name=name))
+                _runRecipeBuild(
+                    section, name, package_index, temp_dir, build_env, workers == 1, telemetry
+                )
+
+        waiting = list(to_build)
+        running = {}
+        finished = set()
+        while waiting or running:
+            for node in list(waiting):
+                # Prerequisites that were installed already are not in the downloads.
+                if all(
+                    prerequisite in finished or prerequisite not in downloads
+                    for prerequisite in prerequisites[node]
+                ):
+                    waiting.remove(node)
+                    running[build_pool.submit(buildRecipe, *node)] = node
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                # Raises build errors, the pools wait for builds still running.
+                future.result()
+                finished.add(node)
+
+
+def install_build_tool(name):
+    installRecipes([("build_tools", name)])
+
+
+def install_dependency(name):
+    installRecipes([("dependencies", name)])
 
 
 from pip._internal.req.req_install import InstallRequirement
@@ -273,7 +744,7 @@ def _build_one_inside_env(
         if req.name == "certifi":
             fallback = True
         else:
-            throw
+            raise
 
     if fallback or not req.source_dir:
         __np__.my_print("FALLBACK to standard install for %s" % req.name)
@@ -293,21 +764,28 @@ def _build_one_inside_env(
             matched_source = source
             break
 
-    install_temp_dir = os.path.dirname(req.source_dir)
+    with BuildTelemetry.measure("package", req.name, req.metadata["Version"]) as telemetry:
+        return _buildPackage(req, matched_source, telemetry)
 
-    if "build_tools" in matched_source:
-        for dep in matched_source["build_tools"]:
-            install_build_tool(dep)
 
-    if "dependencies" in matched_source:
-        for dep in matched_source["dependencies"]:
-            install_dependency(dep)
+def _buildPackage(req, matched_source, telemetry):
+    install_temp_dir = os.path.dirname(req.source_dir)
 
-    for file in matched_source["files"]:
-        package_dir_url = getPackageUrl("packages", req.name)
-        urlretrieve(
-            "{package_dir_url}/{file}".format(**locals()),
-            os.path.join(install_temp_dir, file),
+    with telemetry.phase("dependencies"):
+        installRecipes(
+            [("build_tools", tool) for tool in matched_source.get("build_tools", ())]
+            + [("dependencies", dep) for dep in matched_source.get("dependencies", ())]
+        )
+
+    package_dir_url = getPackageUrl("packages", req.name)
+    with telemetry.phase("download"):
+        __np__.download_files(
+            (
+                "{0}/{1}".format(package_dir_url, file),
+                os.path.dirname(os.path.join(install_temp_dir, file)),
+                matched_source.get("hashes", {}).get(file),
+            )
+            for file in matched_source["files"]
         )
 
     build_script_module_name = getBuildScriptName(install_temp_dir, req.name)
@@ -327,7 +805,8 @@ def _build_one_inside_env(
     os.environ["NUITKA_PYTHON_STATIC_PATTERN"] = static_pattern or ""
 
     try:
-        result = build_script_module.run(install_temp_dir, req.source_dir)
+        with telemetry.phase("build"):
+            result = build_script_module.run(install_temp_dir, req.source_dir)
     finally:
         if build_script_module_name in sys.modules:
             del sys.modules[build_script_module_name]
@@ -413,9 +892,12 @@ def install(
         use_user_site = False,
         pycompile = True,
     ):
-    orig_install(self, global_options, root, home, prefix, warn_script_location, use_user_site, pycompile)
+    with BuildTelemetry.measure("install", self.name) as telemetry:
+        with telemetry.phase("install"):
+            orig_install(self, global_options, root, home, prefix, warn_script_location, use_user_site, pycompile)
 
-    rebuildpython.run_rebuild()
+        with telemetry.phase("rebuild"):
+            rebuildpython.request_rebuild()
 
 pip._internal.req.req_install.InstallRequirement.install = install
 
@@ -447,9 +929,31 @@ def main():
         if os.path.exists(path) and not os.access(path, os.W_OK):
             sys.exit("Error, cannot write to '%s', but that is required." % path)
 
+    # Options of our own, these are passed on via environment to pip sub-processes.
+    for arg, rebuild_mode in (("--batch-rebuild", "batch"), ("--defer-rebuild", "defer")):
+        if arg in sys.argv:
+            sys.argv.remove(arg)
+            os.environ["NUITKA_PYTHON_REBUILD_MODE"] = rebuild_mode
+
+    rebuild_mode = rebuildpython.get_rebuild_mode()
+
+    # Only this pip run finalizes a batch, sub-processes like the ones of build
+    # isolation must leave their rebuilds pending for it instead of relinking.
+    if rebuild_mode == "batch":
+        os.environ["NUITKA_PYTHON_REBUILD_MODE"] = "defer"
+
     from pip._internal.cli.main import main as _main
 
-    sys.exit(_main())
+    result = _main()
+
+    if rebuild_mode == "batch" and rebuildpython.is_rebuild_pending():
+        with BuildTelemetry.measure("interpreter", "rebuild") as telemetry:
+            with telemetry.phase("rebuild"):
+                rebuildpython.finalize_rebuild()
+
+    printTelemetrySummary()
+
+    sys.exit(result)
 
 
 if __name__ == "__main__":
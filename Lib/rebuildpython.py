@@ -1,13 +1,17 @@
 from __future__ import print_function
 
 import __np__
+import ast
+import contextlib
 import ctypes
 import distutils
 import distutils.ccompiler
 import fnmatch
-import glob
 import hashlib
+import importlib.machinery
+import io
 import json
+import marshal
 import os
 import platform
 import shutil
@@ -15,6 +19,7 @@
 import sys
 import sysconfig
 import tempfile
+import time
 
 MOVEFILE_DELAY_UNTIL_REBOOT = 4
 
@@ -31,26 +36,100 @@ def find_files(directory, pattern):
                 yield filename
 
 
-def getPythonInitFunctions(compiler, filename):
+def _readArchiveMember(f):
+    header = f.read(60)
+    if len(header) < 60 or header[58:60] != b"`\n":
+        return None, None
+
+    name = header[:16].rstrip(b" ")
+    size = int(header[48:58])
+
+    # BSD archives store long names right after the header.
+    if name.startswith(b"#1/"):
+        name_length = int(name[3:])
+        name = f.read(name_length).rstrip(b"\0")
+        size -= name_length
+
+    return name, f.read(size)
+
+
+def _parseSymbolStrings(data, count):
+    return [x.decode("latin1") for x in data.split(b"\0")[:count]]
+
+
+def readArchiveSymbols(filename):
+    """Read the symbol index of a static library in "ar" format.
+
+    Handles the GNU/SysV and COFF first linker member as well as the BSD
+    "__.SYMDEF" tables. Returns None if there is no usable symbol index, in
+    which case the caller has to fall back to the binutils tools.
+    """
+    with open(filename, "rb") as f:
+        if f.read(8) not in (b"!<arch>\n", b"!<thin>\n"):
+            return None
+
+        name, data = _readArchiveMember(f)
+
+    if name is None:
+        return None
+
+    if name == b"/":
+        count = int.from_bytes(data[:4], "big")
+        return _parseSymbolStrings(data[4 + 4 * count :], count)
+    elif name == b"/SYM64/":
+        count = int.from_bytes(data[:8], "big")
+        return _parseSymbolStrings(data[8 + 8 * count :], count)
+    elif name.startswith(b"__.SYMDEF"):
+        word_size = 8 if b"64" in name else 4
+        ranlib_size = int.from_bytes(data[:word_size], sys.byteorder)
+        strtab_start = word_size + ranlib_size + word_size
+        strtab = data[strtab_start:]
+
+        symbols = []
+        for offset in range(word_size, word_size + ranlib_size, 2 * word_size):
+            string_index = int.from_bytes(data[offset : offset + word_size], sys.byteorder)
+            symbols.append(strtab[string_index : strtab.index(b"\0", string_index)].decode("latin1"))
+        return symbols
+
+    return None
+
+
+def _getArchiveSymbolsWithTools(compiler, filename):
     if platform.system() == "Windows":
-        initFunctions = [
+        return [
             x.decode("ascii").split(" ")[-1]
             for x in subprocess.check_output(
                 [compiler.dumpbin, "/linkermember", filename]
             ).split(b"\r\n")
             if (b"init" if str is bytes else b"PyInit_") in x
         ]
-        # MSVC adds an underscore to the beginning of all symbols for x32.
-        # We must ignore this underscore.
-        if platform.system() == "Windows" and "32" in platform.architecture()[0]:
-            initFunctions = [x[1:] if x.startswith("_") else x for x in initFunctions]
     else:
-        functions = [
+        return [
             x.decode("ascii").split(" ")[-1]
             for x in subprocess.check_output(["nm", filename]).split(
                 os.linesep.encode("ascii")
             )
         ]
+
+
+def getPythonInitFunctions(compiler, filename):
+    try:
+        functions = readArchiveSymbols(filename)
+    except (OSError, ValueError):
+        functions = None
+
+    if functions is None:
+        functions = _getArchiveSymbolsWithTools(compiler, filename)
+
+    if platform.system() == "Windows":
+        initFunctions = [
+            x for x in functions if ("init" if str is bytes else "PyInit_") in x
+        ]
+        # MSVC adds an underscore to the beginning of all symbols for x32.
+        # We must ignore this underscore.
+        if platform.system() == "Windows" and "32" in platform.architecture()[0]:
+            initFunctions = [x[1:] if x.startswith("_") else x for x in initFunctions]
+    else:
         functions = [x[1:] if x.startswith("_") else x for x in functions]
         initFunctions = [
             x for x in functions if x.startswith("init" if str is bytes else "PyInit_")
@@ -63,8 +142,185 @@ def getPythonInitFunctions(compiler, filename):
     return initFunctions
 
 
-def get_lib_hash():
-    hash_string = ""
+# Symbol index cache, keyed by archive path, validated by size, mtime and digest.
+_symbol_cache = None
+
+
+def _getSymbolCacheFilename():
+    return os.path.join(interpreter_prefix, "symbol_cache.json")
+
+
+def _loadSymbolCache():
+    global _symbol_cache  # singleton, pylint: disable=global-statement
+
+    if _symbol_cache is None:
+        try:
+            with open(_getSymbolCacheFilename(), "r") as f:
+                _symbol_cache = json.load(f)
+        except (FileNotFoundError, ValueError):
+            _symbol_cache = {}
+
+    return _symbol_cache
+
+
+def saveSymbolCache():
+    if _symbol_cache is not None:
+        # Archives that went away with uninstalled packages must not keep growing it.
+        for filename in [
+            filename for filename in _symbol_cache if not os.path.isfile(filename)
+        ]:
+            del _symbol_cache[filename]
+
+        _write_json_atomic(_getSymbolCacheFilename(), _symbol_cache)
+
+
+def getCachedPythonInitFunctions(compiler, filename):
+    symbol_cache = _loadSymbolCache()
+    filename = os.path.abspath(filename)
+
+    entry = symbol_cache.get(filename)
+    fingerprint = get_file_fingerprint(filename, entry and entry["fingerprint"])
+
+    if entry is None or entry["fingerprint"] != fingerprint:
+        entry = {
+            "fingerprint": fingerprint,
+            "init_functions": getPythonInitFunctions(compiler, filename),
+        }
+        symbol_cache[filename] = entry
+
+    return entry["init_functions"]
+
+
+def scanPythonInitFunctions(compiler, filenames):
+    """Get the Python init functions of many archives at once, using a thread pool."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    _loadSymbolCache()
+
+    filenames = list(dict.fromkeys(filenames))
+    with ThreadPoolExecutor(max_workers=int(__np__.get_num_jobs())) as executor:
+        results = executor.map(
+            lambda filename: getCachedPythonInitFunctions(compiler, filename), filenames
+        )
+        result = dict(zip(filenames, results))
+
+    saveSymbolCache()
+
+    return result
+
+
+def get_lib_scan_roots():
+    # Empty and relative entries stand for the working directory, which is
+    # wherever pip or the rebuild happen to run, never scan that.
+    scan_roots = [
+        os.path.abspath(path)
+        for path in reversed(sys.path)
+        if path and os.path.abspath(path) != os.getcwd()
+    ]
+    if platform.system() == "Windows":
+        scan_roots.append(os.path.join(sysconfig.get_config_var('srcdir'), 'libs'))
+    scan_roots.append(interpreter_prefix)
+    scan_roots.append(sysconfig.get_config_var("prefix"))
+
+    return list(dict.fromkeys(scan_roots))
+
+
+# Bumped whenever the way directories get listed changes.
+_LIB_SCAN_CACHE_VERSION = 2
+
+
+def _scanDirectory(directory, old_scan_cache, new_scan_cache):
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except OSError:
+        return [], []
+
+    # A directory mtime only changes when entries are added, removed or renamed, so
+    # the names of a directory unchanged since the last scan can be reused.
+    entry = old_scan_cache.get(directory)
+    if (
+        entry is None
+        or entry["mtime_ns"] != mtime_ns
+        or entry.get("version") != _LIB_SCAN_CACHE_VERSION
+    ):
+        entry = {
+            "version": _LIB_SCAN_CACHE_VERSION,
+            "mtime_ns": mtime_ns,
+            "libs": [],
+            "dirs": [],
+        }
+        try:
+            with os.scandir(directory) as dir_entries:
+                # Directory symlinks are followed, like the recursive glob did.
+                for dir_entry in dir_entries:
+                    if dir_entry.is_dir():
+                        entry["dirs"].append(dir_entry.name)
+                    elif dir_entry.name.endswith((".a", ".lib")) and dir_entry.is_file():
+                        entry["libs"].append(dir_entry.name)
+        except OSError:
+            return [], []
+
+        # The listing order of the file system must not change the lib hash.
+        entry["libs"].sort()
+        entry["dirs"].sort()
+
+    new_scan_cache[directory] = entry
+
+    return entry["libs"], entry["dirs"]
+
+
+def scan_static_libs(scan_roots=None):
+    """Find all static libraries below the scan roots in one pass.
+
+    Returns a dictionary of scan root to the absolute paths of the libraries
+    found below it, in sorted directory walk order. Every directory is only listed
+    once, even if scan roots are nested in each other.
+    """
+    if scan_roots is None:
+        scan_roots = get_lib_scan_roots()
+
+    scan_cache_filename = os.path.join(interpreter_prefix, "lib_scan_cache.json")
+    try:
+        with open(scan_cache_filename, "r") as f:
+            old_scan_cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        old_scan_cache = {}
+    new_scan_cache = {}
+
+    dir_libs = {}
+    # Real paths of the directories being walked, to not loop on directory symlinks.
+    active_dirs = set()
+
+    def scanTree(directory):
+        if directory not in dir_libs:
+            real_directory = os.path.realpath(directory)
+            if real_directory in active_dirs:
+                return []
+            active_dirs.add(real_directory)
+
+            libs, dirs = _scanDirectory(directory, old_scan_cache, new_scan_cache)
+            dir_libs[directory] = [os.path.join(directory, lib) for lib in libs]
+            for sub_dir in dirs:
+                dir_libs[directory] += scanTree(os.path.join(directory, sub_dir))
+
+            active_dirs.discard(real_directory)
+        return dir_libs[directory]
+
+    lib_index = {}
+    for scan_root in scan_roots:
+        lib_index[scan_root] = scanTree(os.path.abspath(scan_root)) if scan_root else []
+
+    if new_scan_cache != old_scan_cache:
+        _write_json_atomic(scan_cache_filename, new_scan_cache)
+
+    return lib_index
+
+
+def get_lib_hash(lib_index=None):
+    if lib_index is None:
+        lib_index = scan_static_libs()
+
+    lib_files = []
     read_files = set()
 
     extra_scan_dirs = []
@@ -77,28 +333,830 @@ def get_lib_hash():
     for path in list(reversed(sys.path)) + extra_scan_dirs:
         # Ignore the working directory so we don't grab duplicate stuff. Also ignore the pip temp path that is
         # injected during a pip install.
+        if not path:
+            continue
+        path = os.path.abspath(path)
         if path == os.getcwd() or "pip-install-" in path:
             continue
 
-        for lib_file in list(glob.glob(os.path.join("**", "*.a"), root_dir=path, recursive=True)) + list(glob.glob(os.path.join("**", "*.lib"), root_dir=path, recursive=True)):
+        for lib_file in lib_index.get(path, ()):
             if os.path.basename(lib_file) in read_files:
                 continue
 
-            with open(os.path.join(path, lib_file), 'rb') as f:
-                hash_string += hashlib.file_digest(f, "sha512").hexdigest()
+            lib_files.append(lib_file)
             read_files.add(os.path.basename(lib_file))
 
+    # Only files whose stat information changed since the last check get hashed again.
+    manifest_filename = os.path.join(interpreter_prefix, "lib_manifest.json")
+    try:
+        with open(manifest_filename, "r") as f:
+            old_manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        old_manifest = {}
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=int(__np__.get_num_jobs())) as executor:
+        fingerprints = list(
+            executor.map(
+                lambda lib_file: get_file_fingerprint(lib_file, old_manifest.get(lib_file)),
+                lib_files,
+            )
+        )
+
+    manifest = dict(zip(lib_files, fingerprints))
+    if manifest != old_manifest:
+        _write_json_atomic(manifest_filename, manifest)
+
+    hash_string = "".join(fingerprint["digest"] for fingerprint in fingerprints)
     return hashlib.sha256(hash_string.encode('ascii')).hexdigest()
 
+
+def get_file_fingerprint(filename, old_fingerprint=None):
+    stat_result = os.stat(filename)
+
+    # Only read the file again if its metadata says it might have changed.
+    if (
+        old_fingerprint is not None
+        and old_fingerprint.get("size") == stat_result.st_size
+        and old_fingerprint.get("mtime_ns") == stat_result.st_mtime_ns
+        and old_fingerprint.get("inode") == stat_result.st_ino
+    ):
+        return old_fingerprint
+
+    with open(filename, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+
+    return {
+        "size": stat_result.st_size,
+        "mtime_ns": stat_result.st_mtime_ns,
+        "inode": stat_result.st_ino,
+        "digest": digest,
+    }
+
+
+def resolve_link_lib(lib, library_dirs):
+    if os.path.isabs(lib) or os.path.isfile(lib):
+        return lib if os.path.isfile(lib) else None
+
+    for dir in library_dirs:
+        for candidate in (lib, lib + ".a", lib + ".lib", "lib" + lib + ".a"):
+            if os.path.isfile(os.path.join(dir, candidate)):
+                return os.path.join(dir, candidate)
+
+    return None
+
+
+def _getLinkJsonStamp(final_path):
+    try:
+        stat_result = os.stat(final_path + ".link.json")
+    except OSError:
+        return None
+
+    return [stat_result.st_size, stat_result.st_mtime_ns]
+
+
+def resolve_link_graph(root_libs, root_library_dirs, cached_graph=None):
+    """Resolve the libraries to link, following their ".link.json" files.
+
+    Libraries are ordered so that every library comes before the libraries it
+    depends on, as static linking requires, and roots keep their given order,
+    so the link is reproducible. Each library appears once, identified by the
+    file it resolves to, or its name for system libraries.
+
+    The result is a dictionary, that can be passed back as cached graph. It is
+    reused if the roots are the same and none of the ".link.json" files changed.
+    """
+    if (
+        cached_graph is not None
+        and cached_graph.get("roots") == [root_libs, root_library_dirs]
+        and all(
+            _getLinkJsonStamp(final_path) == stamp
+            for final_path, stamp in cached_graph["stamps"].items()
+        )
+    ):
+        return cached_graph
+
+    library_dirs = list(root_library_dirs)
+    extra_link_args = []
+    stamps = {}
+    visited = set()
+    post_order = []
+
+    def visit(lib):
+        final_path = resolve_link_lib(lib, library_dirs)
+        node = os.path.abspath(final_path) if final_path is not None else lib
+        if node in visited:
+            return
+        visited.add(node)
+
+        if final_path is not None:
+            stamps[final_path] = _getLinkJsonStamp(final_path)
+
+            if stamps[final_path] is not None:
+                with open(final_path + ".link.json", "r") as f:
+                    link_data = json.load(f)
+
+                for library_dir in link_data["library_dirs"]:
+                    library_dir = os.path.normpath(
+                        os.path.join(os.path.dirname(final_path), library_dir)
+                    )
+                    if library_dir not in library_dirs:
+                        library_dirs.append(library_dir)
+                extra_link_args.extend(link_data.get("extra_postargs", []))
+
+                # Reversed, since the post order is reversed at the end.
+                for dependency in reversed(link_data["libraries"]):
+                    visit(dependency)
+
+        post_order.append(lib)
+
+    for lib in reversed(root_libs):
+        visit(lib)
+
+    return {
+        "roots": [root_libs, root_library_dirs],
+        "libraries": post_order[::-1],
+        "library_dirs": library_dirs,
+        "extra_link_args": extra_link_args,
+        "stamps": stamps,
+    }
+
+
+def load_fingerprint_db():
+    try:
+        with open(os.path.join(interpreter_prefix, "link_fingerprints.json"), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_fingerprint_db(fingerprint_db):
+    _write_json_atomic(
+        os.path.join(interpreter_prefix, "link_fingerprints.json"), fingerprint_db, indent=1
+    )
+
+
+def get_link_input_fingerprints(link_libs, library_dirs, old_inputs):
+    inputs = {}
+    for lib in link_libs:
+        final_path = resolve_link_lib(lib, library_dirs)
+        if final_path is None:
+            # System libraries like "m" are resolved by the linker itself.
+            continue
+        final_path = os.path.abspath(final_path)
+        inputs[final_path] = get_file_fingerprint(final_path, old_inputs.get(final_path))
+
+    return inputs
+
+
+def report_link_input_changes(old_inputs, new_inputs):
+    for path in sorted(set(new_inputs) - set(old_inputs)):
+        print("Link input added:", path)
+    for path in sorted(set(old_inputs) - set(new_inputs)):
+        print("Link input removed:", path)
+    for path in sorted(set(old_inputs) & set(new_inputs)):
+        if old_inputs[path]["digest"] != new_inputs[path]["digest"]:
+            print("Link input changed:", path)
+
+
+def load_module_allowlist(filename):
+    """Read the modules to link from an allowlist or a "-X importtime" trace.
+
+    Allowlists have one module name per line, "#" starts a comment. Lines of
+    the output of "python -X importtime" are recognized, so a recorded import
+    trace of the application can be used directly.
+    """
+    allowed_modules = set()
+
+    with open(filename, "r") as f:
+        for line in f:
+            if line.startswith("import time:"):
+                module_name = line.rsplit("|", 1)[-1].strip()
+                if module_name == "imported package":
+                    continue
+            else:
+                module_name = line.split("#", 1)[0].strip()
+
+            if module_name:
+                allowed_modules.add(module_name)
+
+    return allowed_modules
+
+
+def get_freeze_packages():
+    freeze_packages = os.environ.get("NUITKA_PYTHON_FREEZE_PACKAGES", "")
+    return [package.strip() for package in freeze_packages.split(",") if package.strip()]
+
+
+def _is_below_directory(filename, directory):
+    filename = os.path.normcase(os.path.realpath(filename))
+    directory = os.path.normcase(os.path.realpath(directory))
+    return os.path.commonpath([filename, directory]) == directory
+
+
+def find_freeze_modules(packages):
+    """Find the source files of top level pure Python packages to freeze.
+
+    Returns sorted (module name, filename, is package) tuples. Directories
+    without "__init__.py" are left to be imported from disk, as are
+    extension modules, which the frozen packages still find on their path.
+    """
+    modules = {}
+    site_dirs = set(sysconfig.get_paths()[key] for key in ("purelib", "platlib"))
+
+    for package in packages:
+        spec = importlib.machinery.PathFinder.find_spec(package)
+        if spec is None or not spec.has_location or not spec.origin.endswith(".py"):
+            print("Not freezing '%s', it is not a pure Python module or package." % package)
+            continue
+        if not any(
+            _is_below_directory(spec.origin, site_dir) for site_dir in site_dirs
+        ):
+            print("Not freezing '%s', it is not installed in site-packages." % package)
+            continue
+
+        if spec.submodule_search_locations is None:
+            modules[package] = (spec.origin, False)
+            continue
+
+        package_dir = os.path.dirname(spec.origin)
+        for root, dirs, files in os.walk(package_dir):
+            dirs[:] = sorted(
+                d
+                for d in dirs
+                if d.isidentifier() and os.path.isfile(os.path.join(root, d, "__init__.py"))
+            )
+
+            relative_path = os.path.relpath(root, package_dir)
+            module_prefix = package
+            if relative_path != os.curdir:
+                module_prefix += "." + relative_path.replace(os.sep, ".")
+
+            for filename in files:
+                if filename == "__init__.py":
+                    modules[module_prefix] = (os.path.join(root, filename), True)
+                elif filename.endswith(".py") and filename[:-3].isidentifier():
+                    modules[module_prefix + "." + filename[:-3]] = (
+                        os.path.join(root, filename),
+                        False,
+                    )
+
+    return sorted((name, filename, is_package) for name, (filename, is_package) in modules.items())
+
+
+def get_freeze_hash(freeze_modules):
+    freeze_hash = hashlib.sha256()
+    for module_name, filename, is_package in freeze_modules:
+        freeze_hash.update(("%s:%s:%d\0" % (module_name, filename, is_package)).encode("utf8"))
+        with open(filename, "rb") as f:
+            freeze_hash.update(f.read())
+    return freeze_hash.hexdigest()
+
+
+def compile_freeze_module(filename, is_package):
+    with open(filename, "rb") as f:
+        tree = compile(f.read(), filename, "exec", ast.PyCF_ONLY_AST, dont_inherit=True)
+
+    # The frozen importer locates frozen modules in the standard library, point
+    # them back to their files, for data files and submodules not frozen. With
+    # a file loader in the spec, "importlib.resources", "pkgutil" and
+    # "inspect" find them there too.
+    prologue = "__file__ = %r\n" % filename
+    if is_package:
+        prologue += "__path__ = [%r]\n" % os.path.dirname(filename)
+    prologue += (
+        "if __spec__ is not None:\n"
+        "    __loader__ = __spec__.loader = __import__(\n"
+        "        '_frozen_importlib_external').SourceFileLoader(__name__, __file__)\n"
+        "    __spec__.origin = __file__\n"
+        "    __spec__.has_location = True\n"
+    )
+    if is_package:
+        prologue += "    __spec__.submodule_search_locations = __path__\n"
+
+    # After the docstring and future imports, which have to come first.
+    index = 0
+    if tree.body and isinstance(tree.body[0], ast.Expr) and isinstance(tree.body[0].value, ast.Constant) \
+            and isinstance(tree.body[0].value.value, str):
+        index = 1
+    while index < len(tree.body) and isinstance(tree.body[index], ast.ImportFrom) \
+            and tree.body[index].module == "__future__":
+        index += 1
+    tree.body[index:index] = ast.parse(prologue).body
+
+    return compile(tree, filename, "exec", dont_inherit=True)
+
+
+def _import_deepfreeze():
+    # Needs the tools and sources of the Python build, which installations may lack.
+    scripts_dir = os.path.join(sysconfig.get_config_var("srcdir") or "", "Tools", "scripts")
+    if not os.path.isfile(os.path.join(scripts_dir, "deepfreeze.py")):
+        return None
+
+    sys.path.insert(0, scripts_dir)
+    try:
+        import deepfreeze
+    except Exception as e:  # pylint: disable=broad-except
+        print("Cannot use deepfreeze, freezing as marshal data:", e)
+        return None
+    finally:
+        sys.path.remove(scripts_dir)
+
+    return deepfreeze
+
+
+def generate_frozen_modules(freeze_modules, output_filename):
+    """Write the C source of the frozen module table, return the frozen module names.
+
+    With the tools of the Python build, code objects are deep frozen into static
+    objects, otherwise they are stored as marshal data, which still saves the
+    path lookups, stat calls and ".pyc" reads of importing them from disk.
+    """
+    codes = []
+    for module_name, filename, is_package in freeze_modules:
+        try:
+            codes.append((module_name, is_package, compile_freeze_module(filename, is_package)))
+        except (SyntaxError, ValueError) as e:
+            print("Not freezing module '%s': %s" % (module_name, e))
+
+    deepfreeze = _import_deepfreeze()
+
+    output = io.StringIO()
+    entries = []
+    if deepfreeze is not None:
+        printer = deepfreeze.Printer(output)
+        for index, (module_name, is_package, code) in enumerate(codes):
+            printer.generate_file("_PyNp_frozen_%d" % index, code)
+
+        # Strings of static code objects are interned when the first one is used.
+        output.write("\nstatic int _PyNp_frozen_interned = 0;\n\n")
+        output.write("static int\n_PyNp_InternFrozen(void)\n{\n")
+        for intern in printer.interns:
+            output.write("    if (%s < 0) {\n        return -1;\n    }\n" % intern)
+        output.write("    _PyNp_frozen_interned = 1;\n    return 0;\n}\n")
+
+        for index, (module_name, is_package, code) in enumerate(codes):
+            output.write(
+                "\nstatic PyObject *\n_PyNp_get_frozen_%d(void)\n{\n"
+                "    if (!_PyNp_frozen_interned && _PyNp_InternFrozen() < 0) {\n"
+                "        return NULL;\n    }\n"
+                "    return _Py_get__PyNp_frozen_%d_toplevel();\n}\n" % (index, index)
+            )
+            entries.append(
+                '    {"%s", NULL, 0, %d, _PyNp_get_frozen_%d},\n'
+                % (module_name, is_package, index)
+            )
+    else:
+        output.write('#include "Python.h"\n')
+        for index, (module_name, is_package, code) in enumerate(codes):
+            data = marshal.dumps(code)
+            output.write("\nstatic const unsigned char _PyNp_frozen_%d[] = {\n" % index)
+            for offset in range(0, len(data), 16):
+                output.write("    %s,\n" % ",".join(str(c) for c in data[offset:offset + 16]))
+            output.write("};\n")
+            entries.append(
+                '    {"%s", _PyNp_frozen_%d, (int)sizeof(_PyNp_frozen_%d), %d, NULL},\n'
+                % (module_name, index, index, is_package)
+            )
+
+    output.write(
+        "\nconst struct _frozen _PyNp_FrozenModules[] = {\n%s    {0, 0, 0, 0, NULL}\n};\n"
+        % "".join(entries)
+    )
+
+    with open(output_filename, "w") as f:
+        f.write(output.getvalue())
+
+    print(
+        "Froze %d modules%s."
+        % (len(codes), " as static code objects" if deepfreeze is not None else "")
+    )
+
+    return [module_name for module_name, _is_package, _code in codes]
+
+
+def profile_interpreter(executable, runs=5):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call(
+            [executable, "-c", "pass"], env=dict(os.environ, PYTHONHOME=sys.prefix)
+        )
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "size": os.path.getsize(executable),
+        "startup_ms": round(sorted(timings)[runs // 2] * 1000, 2),
+    }
+
+
+def report_interpreter_profile(old_profile, new_profile):
+    print("Interpreter profile:        before       after")
+    for key, description in (
+        ("size", "binary size (bytes)"),
+        ("inittab_size", "inittab entries"),
+        ("startup_ms", "startup time (ms)"),
+    ):
+        print(
+            "  %-20s %12s %12s"
+            % (description, old_profile.get(key, "unknown"), new_profile.get(key, "unknown"))
+        )
+
+
+def _write_json_atomic(filename, data, **kwargs):
+    # Readers never see a partially written file, and a failure keeps the old one.
+    tmp_filename = "%s.%d.tmp" % (filename, os.getpid())
+    with open(tmp_filename, "w") as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp_filename, filename)
+
+
+def write_link_json(link_data):
+    _write_json_atomic(os.path.join(interpreter_prefix, "link.json"), link_data)
+
+
+def _lock_file(lock_file, blocking):
+    if os.name == "nt":
+        import msvcrt
+
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+
+
+@contextlib.contextmanager
+def rebuild_lock():
+    """Serialize rebuilds of concurrent pip runs on the same interpreter."""
+    with open(os.path.join(interpreter_prefix, "rebuild.lock"), "a+") as lock_file:
+        try:
+            _lock_file(lock_file, blocking=False)
+        except OSError:
+            print("Waiting for another interpreter rebuild to finish...")
+            while True:
+                try:
+                    _lock_file(lock_file, blocking=True)
+                    break
+                except OSError:
+                    # Windows gives up after 10 seconds of waiting.
+                    pass
+
+        # Closing the file releases the lock.
+        yield
+
+
+# Previous interpreters are kept with their link state for "--rollback".
+def get_interpreter_history_dir():
+    return os.path.join(interpreter_prefix, "interpreter_history")
+
+
+_interpreter_state_files = ("link.json", "link_fingerprints.json")
+
+# The core modules must import. The other statically linked top level modules
+# are initialized too, to catch crashes, but may fail to import, e.g. when
+# they need a display or hardware that the host lacks.
+_smoke_test_code = """
+import sys, _io, encodings
+for name in sys.builtin_module_names:
+    if "." not in name:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+"""
+
+
+def smoke_test_interpreter(executable):
+    try:
+        subprocess.run(
+            [executable, "-c", _smoke_test_code],
+            env=dict(os.environ, PYTHONHOME=sys.prefix),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            timeout=300,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        sys.exit(
+            "Error, the relinked interpreter failed its smoke test, keeping the current one:\n%s"
+            % (getattr(e, "output", None) or e)
+        )
+
+
+def backup_interpreter(interpreter_path):
+    keep = int(os.environ.get("NUITKA_PYTHON_KEEP_INTERPRETERS", 2))
+    if keep <= 0:
+        return
+
+    history_dir = get_interpreter_history_dir()
+    entry_dir = os.path.join(history_dir, "%020d" % time.time_ns())
+    os.makedirs(entry_dir)
+
+    backup_path = os.path.join(entry_dir, os.path.basename(interpreter_path))
+    try:
+        # The replaced file stays alive through the link, no need to copy it.
+        os.link(interpreter_path, backup_path)
+    except OSError:
+        shutil.copy2(interpreter_path, backup_path)
+
+    for state_file in _interpreter_state_files:
+        if os.path.isfile(os.path.join(interpreter_prefix, state_file)):
+            shutil.copy2(os.path.join(interpreter_prefix, state_file), entry_dir)
+
+    for old_entry in sorted(os.listdir(history_dir))[:-keep]:
+        shutil.rmtree(os.path.join(history_dir, old_entry), ignore_errors=True)
+
+
+def _replace_interpreter(staged_path, interpreter_path):
+    if platform.system() == "Windows":
+        # A running executable cannot be replaced, but it can be moved away and deleted later.
+        tmp = tempfile.NamedTemporaryFile(delete=False)
+        tmp.close()
+        os.unlink(tmp.name)
+        shutil.move(interpreter_path, tmp.name)
+        ctypes.windll.kernel32.MoveFileExW(tmp.name, None, MOVEFILE_DELAY_UNTIL_REBOOT)
+        shutil.move(staged_path, interpreter_path)
+    else:
+        # Atomic, there is always an interpreter, and running processes keep the old file.
+        os.replace(staged_path, interpreter_path)
+
+
+def _get_staged_interpreter_path(interpreter_path):
+    if platform.system() == "Windows":
+        root, ext = os.path.splitext(interpreter_path)
+        return root + ".new" + ext
+    else:
+        # Versioned names like "python3.11" have no extension to keep.
+        return interpreter_path + ".new"
+
+
+def install_interpreter(new_executable, interpreter_path):
+    """Replace the interpreter by a new build, after it passed a smoke test.
+
+    The new binary is staged beside the old one, so the final rename stays on
+    one file system and macOS "@loader_path" lookups work for the test.
+    """
+    staged_path = _get_staged_interpreter_path(interpreter_path)
+    shutil.copy2(new_executable, staged_path)
+
+    try:
+        smoke_test_interpreter(staged_path)
+        backup_interpreter(interpreter_path)
+        _replace_interpreter(staged_path, interpreter_path)
+    finally:
+        if os.path.exists(staged_path):
+            os.unlink(staged_path)
+
+
+def rollback_interpreter(interpreter_path=None):
+    """Restore the previous interpreter and its link state from the history."""
+    history_dir = get_interpreter_history_dir()
+    entries = sorted(os.listdir(history_dir)) if os.path.isdir(history_dir) else []
+    if not entries:
+        sys.exit("Error, no previous interpreter to roll back to.")
+
+    if interpreter_path is None:
+        interpreter_path = (
+            sys.executable if platform.system() == "Windows" else os.path.realpath(sys.executable)
+        )
+    entry_dir = os.path.join(history_dir, entries[-1])
+
+    staged_path = _get_staged_interpreter_path(interpreter_path)
+    shutil.copy2(os.path.join(entry_dir, os.path.basename(interpreter_path)), staged_path)
+    _replace_interpreter(staged_path, interpreter_path)
+
+    for state_file in _interpreter_state_files:
+        if os.path.isfile(os.path.join(entry_dir, state_file)):
+            os.replace(
+                os.path.join(entry_dir, state_file), os.path.join(interpreter_prefix, state_file)
+            )
+        elif os.path.isfile(os.path.join(interpreter_prefix, state_file)):
+            os.unlink(os.path.join(interpreter_prefix, state_file))
+
+    shutil.rmtree(entry_dir)
+    print("Rolled back interpreter to the build from %s." % time.ctime(int(entries[-1]) / 1e9))
+
+
+# When to relink the interpreter after installing packages: "immediate" after every
+# package, "batch" once at the end of the pip run, and "defer" only records that a
+# rebuild is pending for "python -m rebuildpython --finalize".
+REBUILD_MODES = ("immediate", "batch", "defer")
+
+
+def get_rebuild_mode():
+    rebuild_mode = os.environ.get("NUITKA_PYTHON_REBUILD_MODE", "immediate")
+    if rebuild_mode not in REBUILD_MODES:
+        sys.exit(
+            "Error, NUITKA_PYTHON_REBUILD_MODE must be one of %s, not '%s'."
+            % (", ".join(REBUILD_MODES), rebuild_mode)
+        )
+    return rebuild_mode
+
+
+# How to link the interpreter on Linux. "full" optimizes the whole program as a single LTO
+# partition, for the fastest interpreter. "auto" and "partitioned" run LTO in parallel,
+# "thin" uses ThinLTO with a persistent cache and needs clang and lld, falling back to
+# "partitioned" without them, and "none" links without LTO for quick development
+# iterations, which needs fat LTO objects in the archives.
+LINK_MODES = ("full", "auto", "partitioned", "thin", "none")
+
+
+def get_link_mode():
+    link_mode = os.environ.get("NUITKA_PYTHON_LINK_MODE", "full")
+    if link_mode not in LINK_MODES:
+        sys.exit(
+            "Error, NUITKA_PYTHON_LINK_MODE must be one of %s, not '%s'."
+            % (", ".join(LINK_MODES), link_mode)
+        )
+
+    if link_mode == "thin":
+        problem = _check_thin_lto_toolchain()
+        if problem is not None:
+            print("ThinLTO %s, using link mode 'partitioned' instead." % problem)
+            link_mode = "partitioned"
+
+    return link_mode
+
+
+def _check_thin_lto_toolchain():
+    """Return why ThinLTO cannot be used, or None if clang and lld are there."""
+    compiler = (sysconfig.get_config_var("CC") or "cc").split()[0]
+    try:
+        version = subprocess.run(
+            [compiler, "--version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        ).stdout
+    except OSError:
+        version = ""
+    if "clang" not in version:
+        return "needs clang as the compiler, not '%s'" % compiler
+
+    # Clang looks for the linker beside itself before the PATH.
+    compiler_dir = os.path.dirname(shutil.which(compiler) or "")
+    if not any(
+        shutil.which(linker, path=search_path)
+        for linker in ("ld.lld", "lld")
+        for search_path in (compiler_dir or None, None)
+    ):
+        return "needs the lld linker, which was not found"
+
+    return None
+
+
+def get_linux_lto_flags(link_mode):
+    if link_mode == "full":
+        return ["-flto", "-fuse-linker-plugin", "-ffat-lto-objects", "-flto-partition=none"]
+    elif link_mode == "auto":
+        return ["-flto=auto", "-fuse-linker-plugin", "-ffat-lto-objects"]
+    elif link_mode == "partitioned":
+        link_threads = os.environ.get("LINK_THREADS", __np__.get_num_jobs())
+        return [
+            "-flto=%s" % link_threads,
+            "-fuse-linker-plugin",
+            "-ffat-lto-objects",
+            "-flto-partition=balanced",
+        ]
+    elif link_mode == "thin":
+        link_threads = os.environ.get("LINK_THREADS", __np__.get_num_jobs())
+        return [
+            "-flto=thin",
+            "-flto-jobs=%s" % link_threads,
+            "-fuse-ld=lld",
+            "-Wl,--thinlto-cache-dir=" + os.path.join(interpreter_prefix, "thinlto_cache"),
+        ]
+    else:
+        return ["-fno-lto"]
+
+
+def report_link_times(link_times, link_mode):
+    print("Link times per link mode, NUITKA_PYTHON_LINK_MODE selects one:")
+    for mode in LINK_MODES:
+        if mode in link_times:
+            print(
+                "  %-12s %8.1fs%s"
+                % (mode, link_times[mode], "  (this link)" if mode == link_mode else "")
+            )
+
+
+def train_workload_profile(link, executable, pgd_filename):
+    """Create a PGO profile of the NUITKA_PYTHON_PGO_TRAINING workload on Windows.
+
+    Links an instrumented interpreter with the given link function, runs the
+    training workload with it, and merges the collected counts into the pgd.
+    """
+    import glob
+
+    import __np__.pgo
+
+    pgc_pattern = os.path.splitext(pgd_filename)[0] + "!*.pgc"
+    for filename in glob.glob(pgc_pattern) + glob.glob(pgd_filename):
+        os.unlink(filename)
+
+    print("Linking instrumented interpreter for PGO training...")
+    link(["/GENPROFILE:PGD=" + pgd_filename])
+
+    __np__.pgo.run_training(
+        executable,
+        env=dict(
+            os.environ, PYTHONHOME=sys.prefix, VCPROFILE_PATH=os.path.dirname(pgd_filename)
+        ),
+    )
+
+    pgc_files = sorted(glob.glob(pgc_pattern))
+    if not pgc_files:
+        sys.exit("Error, the PGO training workload produced no profile data.")
+
+    __np__.run_with_output(
+        __np__.find_compiler_exe("pgomgr.exe"), "/merge", *pgc_files, pgd_filename
+    )
+    for filename in pgc_files:
+        os.unlink(filename)
+
+
+def get_rebuild_pending_filename():
+    return os.path.join(interpreter_prefix, "rebuild_pending")
+
+
+def mark_rebuild_pending():
+    with open(get_rebuild_pending_filename(), "w") as f:
+        f.write("1")
+
+
+def is_rebuild_pending():
+    return os.path.isfile(get_rebuild_pending_filename())
+
+
+def request_rebuild():
+    """Rebuild after an install, or leave it pending according to the rebuild mode."""
+    if get_rebuild_mode() == "immediate":
+        run_rebuild()
+    else:
+        mark_rebuild_pending()
+
+
+def finalize_rebuild():
+    """Run a rebuild that was deferred by pip installs and clear the pending marker."""
+    run_rebuild()
+
+    if is_rebuild_pending():
+        os.unlink(get_rebuild_pending_filename())
+
+
 def run_rebuild():
+    with rebuild_lock():
+        _run_rebuild()
+
+        # Build tools read the configuration variables all the time, have them precomputed.
+        try:
+            sysconfig._write_config_vars_cache()
+        except OSError as e:
+            print("Could not write the sysconfig cache:", e)
+
+
+def _run_rebuild():
     try:
         with open(os.path.join(interpreter_prefix, "link.json"), 'r') as f:
             old_link_data = json.load(f)
     except FileNotFoundError:
         old_link_data = {}
 
+    lib_index = scan_static_libs()
+
     old_hash = old_link_data.get("lib_hash")
-    new_hash = get_lib_hash()
+    new_hash = get_lib_hash(lib_index)
+
+    # Changing the module allowlist needs a relink just like changing a library.
+    module_allowlist = os.environ.get("NUITKA_PYTHON_MODULE_ALLOWLIST")
+    if module_allowlist:
+        with open(module_allowlist, "rb") as f:
+            new_hash = hashlib.sha256(new_hash.encode("ascii") + f.read()).hexdigest()
+
+    # So does changing the PGO training workload, where the relink applies it.
+    pgo_training_hash = None
+    if os.environ.get("NUITKA_PYTHON_PGO_TRAINING"):
+        if platform.system() == "Windows" and ('32bit', 'WindowsPE') != platform.architecture():
+            import __np__.pgo
+
+            pgo_training_hash = __np__.pgo.get_training_hash()
+            new_hash = hashlib.sha256((new_hash + pgo_training_hash).encode("ascii")).hexdigest()
+        elif platform.system() != "Windows":
+            print(
+                "The PGO training workload is applied when building Nuitka-Python with build.sh, "
+                "relinks keep that profile."
+            )
+
+    # And so does changing the frozen packages or their sources.
+    freeze_modules = find_freeze_modules(get_freeze_packages())
+    freeze_hash = None
+    if freeze_modules:
+        freeze_hash = get_freeze_hash(freeze_modules)
+        new_hash = hashlib.sha256((new_hash + freeze_hash).encode("ascii")).hexdigest()
 
     # Try to avoid building if nothing has changed.
     if old_hash == new_hash:
@@ -146,15 +1204,22 @@ def run_rebuild():
     if platform.system() == "Windows":
         extra_scan_dirs.append(os.path.join(sysconfig.get_config_var('srcdir'), 'libs'))
 
+    static_lib_suffix = ".lib" if platform.system() == "Windows" else ".a"
+
     # Scan sys.path for any more lingering static libs.
+    candidate_libs = []
     for path in list(reversed(sys.path)) + extra_scan_dirs:
         # Ignore the working directory so we don't grab duplicate stuff. Also ignore the pip temp path that is
         # injected during a pip install.
+        if not path:
+            continue
+        path = os.path.abspath(path)
         if path == os.getcwd() or installDir == path or path in installDir or "pip-install-" in path:
             continue
-        for file in find_files(
-                path, "*.lib" if platform.system() == "Windows" else "*.a"
-        ):
+        for file in lib_index.get(path, ()):
+            if not file.endswith(static_lib_suffix):
+                continue
+
             if file in checkedLibs:
                 continue
 
@@ -165,36 +1230,49 @@ def run_rebuild():
                 continue
 
             checkedLibs.add(filename_base)
+            candidate_libs.append((path, file))
 
-            initFunctions = getPythonInitFunctions(compiler, file)
-            print(file, initFunctions)
+    libInitFunctions = scanPythonInitFunctions(compiler, [file for _path, file in candidate_libs])
 
-            # If this lib has a Python init function, we should link it in.
-            if initFunctions:
-                relativePath = os.path.relpath(file, path)
-                if "site-packages" in relativePath:
-                    continue
-                dirpath, filename = os.path.split(relativePath)
-                if platform.system() != "Windows" and filename.startswith("lib"):
-                    filename = filename[3:]
-                if ext_suffix and filename.endswith(ext_suffix):
-                    filename = filename[: len(ext_suffix) * -1]
-                if filename.endswith(".a"):
-                    filename = filename[:-2]
-                if filename.endswith(".lib"):
-                    filename = filename[:-4]
-                relative_path = filename
-                if dirpath:
-                    relative_path = dirpath.replace("\\", ".").replace("/", ".") + "." + relative_path
-                print(relative_path, file)
-                foundLibs[relative_path] = file
+    for path, file in candidate_libs:
+        initFunctions = libInitFunctions[file]
+        print(file, initFunctions)
+
+        # If this lib has a Python init function, we should link it in.
+        if initFunctions:
+            relativePath = os.path.relpath(file, path)
+            if "site-packages" in relativePath:
+                continue
+            dirpath, filename = os.path.split(relativePath)
+            if platform.system() != "Windows" and filename.startswith("lib"):
+                filename = filename[3:]
+            if ext_suffix and filename.endswith(ext_suffix):
+                filename = filename[: len(ext_suffix) * -1]
+            if filename.endswith(".a"):
+                filename = filename[:-2]
+            if filename.endswith(".lib"):
+                filename = filename[:-4]
+            relative_path = filename
+            if dirpath:
+                relative_path = dirpath.replace("\\", ".").replace("/", ".") + "." + relative_path
+            print(relative_path, file)
+            foundLibs[relative_path] = file
+
+    # Only link the extension modules the application actually uses, if asked to.
+    droppedLibs = set()
+    if module_allowlist:
+        allowed_modules = load_module_allowlist(module_allowlist)
+        for module_fullname in list(foundLibs):
+            if module_fullname not in allowed_modules:
+                print("Not linking unused module", module_fullname)
+                droppedLibs.add(foundLibs.pop(module_fullname))
 
     print("Scanning for any additional libs to link...")
     print(foundLibs)
 
-    # Start with the libs needed for a base interpreter.
+    # The libs needed for a base interpreter.
     if platform.system() == "Windows":
-        link_libs = [
+        system_libs = [
             "advapi32",
             "shell32",
             "ole32",
@@ -223,9 +1301,9 @@ def run_rebuild():
             "Netapi32",
         ]
         if "32" in platform.architecture()[0]:
-            link_libs += ["msvcrt"]
+            system_libs += ["msvcrt"]
     else:
-        link_libs = ["m"]
+        system_libs = ["m"]
 
     if platform.system() == "Windows":
         library_dirs = [
@@ -241,51 +1319,24 @@ def run_rebuild():
         ]
 
     # Scrape all available libs from the libs directory. We will let the linker worry about filtering out extra symbols.
-    for file in find_files(
-            sysconfig.get_config_var("prefix"),
-            "*.lib" if platform.system() == "Windows" else "*.a",
-    ):
-        if "interpreter_build" in file:
+    link_libs = []
+    for file in sorted(lib_index[sysconfig.get_config_var("prefix")]):
+        if not file.endswith(static_lib_suffix):
+            continue
+        if "interpreter_build" in file or file in droppedLibs:
             continue
         link_libs.append(file)
 
-    for _name, path in foundLibs.items():
+    for _name, path in sorted(foundLibs.items()):
         link_libs += [path]
 
-    link_libs = list(set(link_libs))
-    library_dirs = list(set(library_dirs))
-    extra_link_args = []
-
-    libIdx = 0
-    while libIdx < len(link_libs):
-        final_path = None
-        lib = link_libs[libIdx]
-        if os.path.isfile(lib):
-            final_path = lib
-        else:
-            for dir in library_dirs:
-                if os.path.isfile(os.path.join(dir, lib)):
-                    final_path = os.path.join(dir, lib)
-                    break
-                elif os.path.isfile(os.path.join(dir, lib) + ".a"):
-                    final_path = os.path.join(dir, lib) + ".a"
-                    break
-        if not final_path:
-            libIdx += 1
-            continue
-        if os.path.isfile(final_path + ".link.json"):
-            with open(final_path + ".link.json", "r") as f:
-                linkData = json.load(f)
-                link_libs += linkData["libraries"]
-                library_dirs += [
-                    os.path.join(os.path.dirname(final_path), x)
-                    for x in linkData["library_dirs"]
-                ]
-                extra_link_args += linkData.get("extra_postargs", [])
-        libIdx += 1
-
-    link_libs = list(set(link_libs))
-    library_dirs = list(set(library_dirs))
+    # System libs go last, static libraries must come before the libraries they use.
+    link_graph = resolve_link_graph(
+        link_libs + system_libs, library_dirs, old_link_data.get("link_graph")
+    )
+    link_libs = list(link_graph["libraries"])
+    library_dirs = list(link_graph["library_dirs"])
+    extra_link_args = list(link_graph["extra_link_args"])
 
     print("Generating interpreter sources...")
 
@@ -304,9 +1355,11 @@ def run_rebuild():
 """
 
     inittab_code = ""
+    inittab_size = 0
 
-    for module_fullname, filename in foundLibs.items():
-        initFunctions = getPythonInitFunctions(compiler, filename)
+    # Sorted for a reproducible header, the import machinery indexes the table by name anyway.
+    for module_fullname, filename in sorted(foundLibs.items()):
+        initFunctions = getCachedPythonInitFunctions(compiler, filename)
 
         if not initFunctions:
             print("Init not found!", module_fullname, filename)
@@ -322,12 +1375,21 @@ def run_rebuild():
 
         staticinitheader += "   extern  PyObject* " + module_initfunc_name + "(void);\n"
         inittab_code += (
-                '   PyImport_AppendInittab("'
+                '        {"'
                 + module_fullname
                 + '", '
                 + module_initfunc_name
-                + ");\n"
+                + "},\n"
         )
+        inittab_size += 1
+
+    frozen_modules_code = ""
+    if freeze_modules:
+        staticinitheader += "   extern const struct _frozen _PyNp_FrozenModules[];\n"
+        frozen_modules_code = """
+        /* Frozen packages are found before the ones on disk. */
+        PyImport_FrozenModules = _PyNp_FrozenModules;
+"""
 
     staticinitheader += (
             """
@@ -336,14 +1398,19 @@ def run_rebuild():
     #endif // __cplusplus
 
     static inline void Py_InitStaticModules(void) {
-    %s
-    }
+        static struct _inittab static_modules[] = {
+%s        {NULL, NULL}
+        };
+
+        /* Add all at once, every PyImport_AppendInittab() call copies the whole table. */
+        PyImport_ExtendInittab(static_modules);
+%s    }
 
     #endif
 
     #endif // !Py_STATICINIT_H
     """
-            % inittab_code
+            % (inittab_code, frozen_modules_code)
     )
 
     with open(
@@ -351,6 +1418,47 @@ def run_rebuild():
     ) as f:
         f.write(staticinitheader)
 
+    # Compare the resolved link inputs against the fingerprints of the last link, so an
+    # archive change that does not end up in the interpreter costs no relink at all.
+    fingerprint_db = load_fingerprint_db()
+    old_inputs = fingerprint_db.get("inputs", {})
+    new_inputs = get_link_input_fingerprints(link_libs, library_dirs, old_inputs)
+    staticinit_hash = hashlib.sha256(staticinitheader.encode("utf8")).hexdigest()
+    link_mode = get_link_mode() if platform.system() == "Linux" else None
+    link_key = hashlib.sha256(
+        json.dumps(
+            [
+                link_libs,
+                library_dirs,
+                extra_link_args,
+                sysconfig.get_config_var("LDFLAGS"),
+                link_mode,
+                pgo_training_hash,
+                freeze_hash,
+            ]
+        ).encode("utf8")
+    ).hexdigest()
+
+    interpreter_fingerprint = None
+    if os.path.isfile(sys.executable):
+        interpreter_fingerprint = get_file_fingerprint(
+            os.path.realpath(sys.executable), fingerprint_db.get("interpreter")
+        )
+
+    if (
+        fingerprint_db.get("link_key") == link_key
+        and fingerprint_db.get("staticinit_hash") == staticinit_hash
+        and fingerprint_db.get("interpreter") == interpreter_fingerprint
+        and old_inputs == new_inputs
+    ):
+        print("Link inputs unchanged. Not relinking interpreter.")
+        old_link_data["lib_hash"] = new_hash
+        old_link_data["link_graph"] = link_graph
+        write_link_json(old_link_data)
+        return
+
+    report_link_input_changes(old_inputs, new_inputs)
+
     print("Compiling new interpreter...")
 
     build_dir = os.path.join(interpreter_prefix, "interpreter_build")
@@ -365,9 +1473,50 @@ def run_rebuild():
 
     os.chdir(interpreter_prefix)
 
+    # The frozen module table is compiled on its own, it changes with the package sources.
+    frozen_objects = []
+    frozen_module_names = []
+    if freeze_modules:
+        frozen_source = os.path.join(os.path.basename(build_dir), "frozen_modules.c")
+        frozen_module_names = generate_frozen_modules(freeze_modules, frozen_source)
+        frozen_objects = [
+            os.path.abspath(frozen_object)
+            for frozen_object in compiler.compile(
+                [frozen_source], include_dirs=include_dirs, macros=macros
+            )
+        ]
+
     link_flags = []
     compile_flags = []
 
+    profile_enabled = bool(module_allowlist) or os.environ.get("NUITKA_PYTHON_REBUILD_PROFILE") == "1"
+    interpreter_profile = None
+
+    def profile_new_interpreter(new_executable):
+        if not profile_enabled:
+            return None
+
+        old_profile = {}
+        if "inittab_size" in old_link_data:
+            old_profile["inittab_size"] = old_link_data["inittab_size"]
+        if os.path.isfile(sys.executable):
+            old_profile.update(profile_interpreter(sys.executable))
+
+        new_profile = profile_interpreter(new_executable)
+        new_profile["inittab_size"] = inittab_size
+        report_interpreter_profile(old_profile, new_profile)
+
+        return new_profile
+
+    # Link times of the link modes used so far, for choosing one per environment.
+    link_times = dict(old_link_data.get("link_times", {}))
+
+    # The main object only depends on the generated static init header, keep it across relinks.
+    need_python_object = not (
+        fingerprint_db.get("staticinit_hash") == staticinit_hash
+        and os.path.isfile(os.path.join(interpreter_prefix, "python.o"))
+    )
+
     if platform.system() == "Windows":
         final_lib_list = []
         for lib in link_libs:
@@ -391,29 +1540,38 @@ def run_rebuild():
             ["python.c"], output_dir=build_dir, include_dirs=include_dirs, macros=macros
         )
 
-        extra_preargs_ = ["/LTCG"]
-        if not ('32bit', 'WindowsPE') == platform.architecture():
-            # Not Win32 where is no PGO
-            extra_preargs_.append("/USEPROFILE:PGD=python.pgd")
+        def link_windows_interpreter(extra_preargs):
+            compiler.link_executable(
+                [os.path.join(build_dir, "python.obj")] + frozen_objects,
+                "python",
+                output_dir=build_dir,
+                libraries=link_libs,
+                library_dirs=library_dirs,
+                extra_preargs=["/LTCG"] + extra_preargs,
+            )
 
-        compiler.link_executable(
-            [os.path.join(build_dir, "python.obj")],
-            "python",
-            output_dir=build_dir,
-            libraries=link_libs,
-            library_dirs=library_dirs,
-            extra_preargs=extra_preargs_,
-        )
+        if pgo_training_hash is not None:
+            workload_pgd = os.path.join(interpreter_prefix, "python-workload.pgd")
 
-        # Replace running interpreter by moving current version to a temp file, then marking it for deletion.
-        interpreter_path = sys.executable
-        tmp = tempfile.NamedTemporaryFile(delete=False)
-        tmp.close()
-        os.unlink(tmp.name)
-        shutil.move(sys.executable, tmp.name)
-        ctypes.windll.kernel32.MoveFileExW(tmp.name, None, MOVEFILE_DELAY_UNTIL_REBOOT)
+            # The profile stays usable across relinks, the linker ignores it for changed code.
+            if (
+                old_link_data.get("pgo_training_hash") != pgo_training_hash
+                or not os.path.isfile(workload_pgd)
+            ):
+                train_workload_profile(
+                    link_windows_interpreter, os.path.join(build_dir, "python.exe"), workload_pgd
+                )
+
+            link_windows_interpreter(["/USEPROFILE:PGD=" + workload_pgd])
+        elif not ('32bit', 'WindowsPE') == platform.architecture():
+            # Not Win32 where is no PGO
+            link_windows_interpreter(["/USEPROFILE:PGD=python.pgd"])
+        else:
+            link_windows_interpreter([])
 
-        shutil.move(os.path.join(build_dir, "python.exe"), interpreter_path)
+        interpreter_profile = profile_new_interpreter(os.path.join(build_dir, "python.exe"))
+
+        install_interpreter(os.path.join(build_dir, "python.exe"), sys.executable)
     elif platform.system() == "Linux":
         sysconfig_libs = []
         sysconfig_lib_dirs = []
@@ -431,45 +1589,40 @@ def run_rebuild():
                 if arg[2:] not in sysconfig_lib_dirs:
                     sysconfig_lib_dirs.append(arg[2:])
 
-        link_libs = sysconfig_libs + link_libs
+        # System libraries come after the resolved graph, whose static archives
+        # depend on them, as static linking requires.
+        link_libs = link_libs + [lib for lib in sysconfig_libs if lib not in link_libs]
         libpython_lib = [x for x in link_libs if os.path.basename(x).startswith('libpython') and x.endswith(".a")][0]
         link_libs = [libpython_lib] + [x for x in link_libs if x != libpython_lib]
         library_dirs = sysconfig_lib_dirs + library_dirs
 
-        compiler.compile(
-            [os.path.join(sysconfig.get_config_var("prefix"), "python.c")],
-            output_dir="/",
-            include_dirs=include_dirs,
-            macros=macros,
-        )
+        if need_python_object:
+            compiler.compile(
+                [os.path.join(sysconfig.get_config_var("prefix"), "python.c")],
+                output_dir="/",
+                include_dirs=include_dirs,
+                macros=macros,
+                depends=[os.path.join(sysconfig.get_config_var("INCLUDEPY"), "staticinit.h")],
+            )
+        else:
+            print("Reusing cached interpreter main object.")
 
+        link_start = time.perf_counter()
         compiler.link_executable(
-            objects=[os.path.join(sysconfig.get_config_var("prefix"), "python.o")],
+            objects=[os.path.join(sysconfig.get_config_var("prefix"), "python.o")] + frozen_objects,
             output_progname="python",
             output_dir=build_dir,
             libraries=link_libs,
             library_dirs=library_dirs,
             extra_preargs=sysconfig.get_config_var("LDFLAGS").split()
-                          + [
-                              "-flto",
-                              "-fuse-linker-plugin",
-                              "-ffat-lto-objects",
-                              "-flto-partition=none",
-                          ],
+                          + get_linux_lto_flags(link_mode),
         )
+        link_times[link_mode] = round(time.perf_counter() - link_start, 2)
+        report_link_times(link_times, link_mode)
 
-        # Replace running interpreter by moving current version to a temp file, then deleting it. This
-        # is to avoid Windows locks
-        interpreter_path = os.path.realpath(sys.executable)
-        tmp = tempfile.NamedTemporaryFile(
-            delete=False, dir=os.path.dirname(sys.executable)
-        )
-        tmp.close()
-        os.unlink(tmp.name)
-        shutil.move(interpreter_path, tmp.name)
-        os.unlink(tmp.name)
+        interpreter_profile = profile_new_interpreter(os.path.join(build_dir, "python"))
 
-        shutil.move(os.path.join(build_dir, "python"), interpreter_path)
+        install_interpreter(os.path.join(build_dir, "python"), os.path.realpath(sys.executable))
     elif platform.system() == "Darwin":
         sysconfig_libs = []
         sysconfig_lib_dirs = []
@@ -485,19 +1638,25 @@ def run_rebuild():
                 if arg[2:] not in sysconfig_lib_dirs:
                     sysconfig_lib_dirs.append(arg[2:])
 
-        link_libs = sysconfig_libs + link_libs
+        # System libraries come after the resolved graph, whose static archives
+        # depend on them, as static linking requires.
+        link_libs = link_libs + [lib for lib in sysconfig_libs if lib not in link_libs]
         libpython_lib = [x for x in link_libs if os.path.basename(x).startswith('libpython') and x.endswith(".a")][0]
         link_libs = [libpython_lib] + [x for x in link_libs if x != libpython_lib]
         library_dirs = [x for x in sysconfig_lib_dirs + library_dirs if 'Nuitka-Python-Deps' not in x]
 
         os.environ["MACOSX_DEPLOYMENT_TARGET"] = "10.9"
 
-        compiler.compile(
-            [os.path.join(sysconfig.get_config_var("prefix"), "python.c")],
-            output_dir="/",
-            include_dirs=include_dirs,
-            macros=macros,
-        )
+        if need_python_object:
+            compiler.compile(
+                [os.path.join(sysconfig.get_config_var("prefix"), "python.c")],
+                output_dir="/",
+                include_dirs=include_dirs,
+                macros=macros,
+                depends=[os.path.join(sysconfig.get_config_var("INCLUDEPY"), "staticinit.h")],
+            )
+        else:
+            print("Reusing cached interpreter main object.")
 
         extra_args_combined = [x for x in sysconfig.get_config_var("LDFLAGS").split() if not x.startswith("-L") and not x.startswith("-l")] \
                                 + extra_link_args \
@@ -527,7 +1686,7 @@ def run_rebuild():
                 i += 1
 
         compiler.link_executable(
-            objects=[os.path.join(sysconfig.get_config_var("prefix"), "python.o")],
+            objects=[os.path.join(sysconfig.get_config_var("prefix"), "python.o")] + frozen_objects,
             output_progname="python",
             output_dir=build_dir,
             libraries=link_libs,
@@ -558,35 +1717,64 @@ def run_rebuild():
 
         link_flags = final_extra_link_args
 
-        # Replace running interpreter by moving current version to a temp file, then deleting it. This
-        # is to avoid Windows locks
-        interpreter_path = os.path.realpath(sys.executable)
-        tmp = tempfile.NamedTemporaryFile(
-            delete=False, dir=os.path.dirname(sys.executable)
-        )
-        tmp.close()
-        os.unlink(tmp.name)
-        shutil.move(interpreter_path, tmp.name)
-        os.unlink(tmp.name)
+        interpreter_profile = profile_new_interpreter(os.path.join(build_dir, "python"))
 
-        shutil.move(os.path.join(build_dir, "python"), interpreter_path)
+        install_interpreter(os.path.join(build_dir, "python"), os.path.realpath(sys.executable))
 
     shutil.rmtree(build_dir, ignore_errors=True)
 
-    with open(os.path.join(interpreter_prefix, "link.json"), "w") as f:
-        json.dump(
-            {
-                "include_dirs": include_dirs,
-                "macros": macros,
-                "libraries": link_libs,
-                "library_dirs": library_dirs,
-                "link_flags": link_flags,
-                "compile_flags": compile_flags,
-                "lib_hash": new_hash
-            },
-            f,
-        )
+    write_link_json(
+        {
+            "include_dirs": include_dirs,
+            "macros": macros,
+            "libraries": link_libs,
+            "library_dirs": library_dirs,
+            "link_flags": link_flags,
+            "compile_flags": compile_flags,
+            "lib_hash": new_hash,
+            "inittab_size": inittab_size,
+            "profile": interpreter_profile,
+            "link_graph": link_graph,
+            "link_mode": link_mode,
+            "link_times": link_times,
+            "pgo_training_hash": pgo_training_hash,
+            "freeze_hash": freeze_hash,
+            "frozen_modules": frozen_module_names,
+        }
+    )
+
+    save_fingerprint_db(
+        {
+            "link_key": link_key,
+            "staticinit_hash": staticinit_hash,
+            "inputs": new_inputs,
+            "interpreter": get_file_fingerprint(os.path.realpath(sys.executable)),
+        }
+    )
 
 
 if __name__ == "__main__":
-    run_rebuild()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Relink the Nuitka-Python interpreter.")
+    parser.add_argument(
+        "--finalize",
+        action="store_true",
+        help="Only rebuild if a deferred pip install left a rebuild pending.",
+    )
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help="Restore the previous interpreter, see NUITKA_PYTHON_KEEP_INTERPRETERS.",
+    )
+    args = parser.parse_args()
+
+    if args.rollback:
+        with rebuild_lock():
+            rollback_interpreter()
+    elif not args.finalize:
+        run_rebuild()
+    elif is_rebuild_pending():
+        finalize_rebuild()
+    else:
+        print("No deferred interpreter rebuild pending.")
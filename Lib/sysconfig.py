@@ -627,6 +627,132 @@ def get_path(name, scheme=get_default_scheme(), vars=None, expand=True):
     return get_paths(scheme, vars, expand)[name]
 
 
+def _init_config_vars(vars):
+    """Compute the configuration variables, all but the ones never cached."""
+    # Normalized versions of prefix and exec_prefix are handy to have;
+    # in fact, these are the standard versions used most places in the
+    # Distutils.
+    vars['prefix'] = _PREFIX
+    vars['exec_prefix'] = _EXEC_PREFIX
+    vars['py_version'] = _PY_VERSION
+    vars['py_version_short'] = _PY_VERSION_SHORT
+    vars['py_version_nodot'] = _PY_VERSION_SHORT_NO_DOT
+    vars['installed_base'] = _BASE_PREFIX
+    vars['base'] = _PREFIX
+    vars['installed_platbase'] = _BASE_EXEC_PREFIX
+    vars['platbase'] = _EXEC_PREFIX
+    vars['projectbase'] = _PROJECT_BASE
+    vars['platlibdir'] = sys.platlibdir
+    vars['SOABI'] = 'cpnuitka3.9'
+    try:
+        vars['abiflags'] = sys.abiflags
+    except AttributeError:
+        # sys.abiflags may not be defined on all platforms.
+        vars['abiflags'] = ''
+    try:
+        vars['py_version_nodot_plat'] = sys.winver.replace('.', '')
+    except AttributeError:
+        vars['py_version_nodot_plat'] = ''
+
+    if os.name == 'nt':
+        _init_non_posix(vars)
+        vars['VPATH'] = sys._vpath
+    if os.name == 'posix':
+        _init_posix(vars)
+
+    # Always convert srcdir to an absolute path
+    srcdir = vars.get('srcdir', _PROJECT_BASE)
+    if os.name == 'posix':
+        if _PYTHON_BUILD:
+            # If srcdir is a relative path (typically '.' or '..')
+            # then it should be interpreted relative to the directory
+            # containing Makefile.
+            base = os.path.dirname(get_makefile_filename())
+            srcdir = os.path.join(base, srcdir)
+        else:
+            # srcdir is not meaningful since the installation is
+            # spread about the filesystem.  We choose the
+            # directory containing the Makefile since we know it
+            # exists.
+            srcdir = os.path.dirname(get_makefile_filename())
+    vars['srcdir'] = _safe_realpath(srcdir)
+
+
+# Precomputed configuration variables of an installation, written when
+# installing and relinking, see _write_config_vars_cache().
+_CONFIG_VARS_CACHE_VERSION = 1
+
+
+def _get_config_vars_cache_filename():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        '_sysconfig_vars.cache')
+
+
+def _get_config_vars_cache_key():
+    """Return everything the cached configuration variables depend on."""
+    sysconfigdata_mtime = None
+    if os.name == 'posix':
+        try:
+            sysconfigdata_mtime = os.stat(os.path.join(
+                os.path.dirname(os.path.abspath(__file__)),
+                _get_sysconfigdata_name() + '.py')).st_mtime_ns
+        except OSError:
+            pass
+    return (_CONFIG_VARS_CACHE_VERSION, sys.version, sys.executable,
+            _PREFIX, _EXEC_PREFIX, _BASE_PREFIX, _BASE_EXEC_PREFIX,
+            _PROJECT_BASE, sys.platlibdir, sysconfigdata_mtime)
+
+
+def _load_config_vars_cache(vars):
+    """Update vars from the cache, return False if it is missing or outdated."""
+    if _PYTHON_BUILD:
+        return False
+    import marshal
+    try:
+        with open(_get_config_vars_cache_filename(), 'rb') as f:
+            key, cached_vars = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return False
+    if key != _get_config_vars_cache_key():
+        return False
+    vars.update(cached_vars)
+    return True
+
+
+def _write_config_vars_cache():
+    """Write the configuration variables cache, return its filename.
+
+    Nothing is written for a Python build, where the variables change with
+    every reconfigure.
+    """
+    global _CONFIG_VARS
+    if _PYTHON_BUILD:
+        return None
+    import marshal
+
+    # Computed afresh, the ones in use may be customized already.
+    config_vars = _CONFIG_VARS
+    _CONFIG_VARS = {}
+    try:
+        _init_config_vars(_CONFIG_VARS)
+        data = marshal.dumps((_get_config_vars_cache_key(), _CONFIG_VARS))
+    finally:
+        _CONFIG_VARS = config_vars
+
+    filename = _get_config_vars_cache_filename()
+    tmp_filename = f'{filename}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_filename, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        try:
+            os.unlink(tmp_filename)
+        except OSError:
+            pass
+        raise
+    return filename
+
 def get_config_vars(*args):
     """With no arguments, return a dictionary of all configuration
     variables relevant for the current platform.
@@ -640,59 +766,16 @@ def get_config_vars(*args):
     global _CONFIG_VARS
     if _CONFIG_VARS is None:
         _CONFIG_VARS = {}
-        # Normalized versions of prefix and exec_prefix are handy to have;
-        # in fact, these are the standard versions used most places in the
-        # Distutils.
-        _CONFIG_VARS['prefix'] = _PREFIX
-        _CONFIG_VARS['exec_prefix'] = _EXEC_PREFIX
-        _CONFIG_VARS['py_version'] = _PY_VERSION
-        _CONFIG_VARS['py_version_short'] = _PY_VERSION_SHORT
-        _CONFIG_VARS['py_version_nodot'] = _PY_VERSION_SHORT_NO_DOT
-        _CONFIG_VARS['installed_base'] = _BASE_PREFIX
-        _CONFIG_VARS['base'] = _PREFIX
-        _CONFIG_VARS['installed_platbase'] = _BASE_EXEC_PREFIX
-        _CONFIG_VARS['platbase'] = _EXEC_PREFIX
-        _CONFIG_VARS['projectbase'] = _PROJECT_BASE
-        _CONFIG_VARS['platlibdir'] = sys.platlibdir
-        _CONFIG_VARS['SOABI'] = 'cpnuitka3.9'
-        try:
-            _CONFIG_VARS['abiflags'] = sys.abiflags
-        except AttributeError:
-            # sys.abiflags may not be defined on all platforms.
-            _CONFIG_VARS['abiflags'] = ''
-        try:
-            _CONFIG_VARS['py_version_nodot_plat'] = sys.winver.replace('.', '')
-        except AttributeError:
-            _CONFIG_VARS['py_version_nodot_plat'] = ''
-
-        if os.name == 'nt':
-            _init_non_posix(_CONFIG_VARS)
-            _CONFIG_VARS['VPATH'] = sys._vpath
-        if os.name == 'posix':
-            _init_posix(_CONFIG_VARS)
+        if not _load_config_vars_cache(_CONFIG_VARS):
+            _init_config_vars(_CONFIG_VARS)
+
         if _HAS_USER_BASE:
             # Setting 'userbase' is done below the call to the
             # init function to enable using 'get_config_var' in
-            # the init-function.
+            # the init-function. It is not cached, as it depends
+            # on the environment.
             _CONFIG_VARS['userbase'] = _getuserbase()
 
-        # Always convert srcdir to an absolute path
-        srcdir = _CONFIG_VARS.get('srcdir', _PROJECT_BASE)
-        if os.name == 'posix':
-            if _PYTHON_BUILD:
-                # If srcdir is a relative path (typically '.' or '..')
-                # then it should be interpreted relative to the directory
-                # containing Makefile.
-                base = os.path.dirname(get_makefile_filename())
-                srcdir = os.path.join(base, srcdir)
-            else:
-                # srcdir is not meaningful since the installation is
-                # spread about the filesystem.  We choose the
-                # directory containing the Makefile since we know it
-                # exists.
-                srcdir = os.path.dirname(get_makefile_filename())
-        _CONFIG_VARS['srcdir'] = _safe_realpath(srcdir)
-
         # OS X platforms require special customization to handle
         # multi-architecture, multi-os-version installers
         if sys.platform == 'darwin':
@@ -840,6 +923,9 @@ def _main():
     if '--generate-posix-vars' in sys.argv:
         _generate_posix_vars()
         return
+    if '--write-config-vars-cache' in sys.argv:
+        _write_config_vars_cache()
+        return
     print(f'Platform: "{get_platform()}"')
     print(f'Python version: "{get_python_version()}"')
     print(f'Current installation scheme: "{get_default_scheme()}"')
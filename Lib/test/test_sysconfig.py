@@ -6,7 +6,7 @@
 from copy import copy
 
 from test.support import (
-    captured_stdout, PythonSymlink, requires_subprocess, is_wasi
+    captured_stdout, PythonSymlink, requires_subprocess, is_wasi, swap_attr
 )
 from test.support.import_helper import import_module
 from test.support.os_helper import (TESTFN, unlink, skip_unless_symlink,
@@ -212,6 +212,29 @@ def test_get_config_vars(self):
         self.assertIsInstance(cvars, dict)
         self.assertTrue(cvars)
 
+    def test_config_vars_cache(self):
+        cache = TESTFN + '.cache'
+        self.addCleanup(unlink, cache)
+        with swap_attr(sysconfig, '_get_config_vars_cache_filename',
+                       lambda: cache), \
+             swap_attr(sysconfig, '_PYTHON_BUILD', False):
+            self.assertEqual(sysconfig._write_config_vars_cache(), cache)
+            self.assertTrue(sysconfig._load_config_vars_cache({}))
+
+            sysconfig._CONFIG_VARS = None
+            with swap_attr(sysconfig, '_load_config_vars_cache',
+                           lambda vars: False):
+                expected = get_config_vars()
+            sysconfig._CONFIG_VARS = None
+            self.assertEqual(get_config_vars(), expected)
+
+            # An outdated or broken cache is ignored.
+            with swap_attr(sysconfig, '_PREFIX', os.path.abspath(TESTFN)):
+                self.assertFalse(sysconfig._load_config_vars_cache({}))
+            with open(cache, 'wb') as f:
+                f.write(b'garbage')
+            self.assertFalse(sysconfig._load_config_vars_cache({}))
+
     def test_get_platform(self):
         # windows XP, 32bits
         os.name = 'nt'
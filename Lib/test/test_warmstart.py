@@ -0,0 +1,149 @@
+import os
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+
+from test import support
+from test.support import os_helper, socket_helper
+
+import warmstart
+
+
+@support.requires_fork()
+@socket_helper.skip_unless_bind_unix_socket
+class WarmstartTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.socket_path = os.path.join(cls.tmp_dir, "warmstart.sock")
+        cls.server = subprocess.Popen(
+            [sys.executable, "-m", "warmstart", "serve", cls.socket_path,
+             "--preload", "json"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + support.SHORT_TIMEOUT
+        while not os.path.exists(cls.socket_path):
+            if cls.server.poll() is not None or time.monotonic() > deadline:
+                cls.tearDownClass()
+                raise unittest.SkipTest("warmstart server did not start")
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.server.poll() is None:
+            cls.server.send_signal(signal.SIGTERM)
+        cls.server.wait(timeout=support.SHORT_TIMEOUT)
+        os_helper.rmtree(cls.tmp_dir)
+
+    def run_client(self, *args, **kwargs):
+        return subprocess.run(
+            [sys.executable, "-m", "warmstart", "run", self.socket_path]
+            + list(args),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            timeout=support.SHORT_TIMEOUT, **kwargs)
+
+    def test_socket_mode(self):
+        mode = stat.S_IMODE(os.stat(self.socket_path).st_mode)
+        self.assertEqual(mode, 0o600)
+
+    def test_command(self):
+        result = self.run_client(
+            "-c", "import sys; print(sys.argv); print('json' in sys.modules)",
+            "arg")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, "['-c', 'arg']\nTrue\n")
+
+    def test_module(self):
+        result = self.run_client("-m", "json.tool", input='{"a": 1}')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, '{\n    "a": 1\n}\n')
+
+    def test_module_from_cwd(self):
+        with os_helper.temp_cwd():
+            with open("warmstart_cwd_module.py", "w") as f:
+                f.write("print(__name__)\n")
+            result = self.run_client("-m", "warmstart_cwd_module")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, "__main__\n")
+
+    def test_script_cwd_and_env(self):
+        with os_helper.temp_cwd() as cwd:
+            with open("script.py", "w") as f:
+                f.write("import os, sys\n"
+                        "print(os.getcwd())\n"
+                        "print(os.environ['WARMSTART_TEST'])\n"
+                        "print(sys.argv[1:])\n")
+            result = self.run_client(
+                "script.py", "x",
+                env=dict(os.environ, WARMSTART_TEST="value"))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(
+            result.stdout.splitlines(),
+            [os.path.realpath(cwd), "value", "['x']"])
+
+    def test_exit_status(self):
+        result = self.run_client("-c", "raise SystemExit(3)")
+        self.assertEqual(result.returncode, 3)
+
+        result = self.run_client("-c", "raise SystemExit('message')")
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stderr, "message\n")
+
+        result = self.run_client("-c", "1/0")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("ZeroDivisionError", result.stderr)
+
+    def test_shutdown(self):
+        code = textwrap.dedent("""
+            import atexit, threading, time
+            atexit.register(print, "atexit")
+            def late():
+                time.sleep(0.5)
+                print("thread")
+            threading.Thread(target=late).start()
+        """)
+        result = self.run_client("-c", code)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, "thread\natexit\n")
+
+    def test_killed_by_signal(self):
+        result = self.run_client(
+            "-c", "import os, signal; os.kill(os.getpid(), signal.SIGKILL)")
+        self.assertEqual(result.returncode, 128 + signal.SIGKILL)
+
+    def check_rejected(self, data, fds=()):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(support.SHORT_TIMEOUT)
+            conn.connect(self.socket_path)
+            socket.send_fds(conn, [data], list(fds))
+            # The server closes the connection without a status.
+            self.assertEqual(conn.recv(warmstart._status.size), b"")
+
+    def test_malformed_request(self):
+        # Without the standard streams.
+        self.check_rejected(b"junk")
+
+        # Not a JSON request.
+        body = b"not json"
+        self.check_rejected(
+            warmstart._header.pack(len(body)) + body, [0, 1, 2])
+
+        # JSON, but not a request.
+        body = b'{"args": []}'
+        self.check_rejected(
+            warmstart._header.pack(len(body)) + body, [0, 1, 2])
+
+        # The server keeps serving.
+        result = self.run_client("-c", "print('alive')")
+        self.assertEqual(result.stdout, "alive\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,350 @@
+"""Start Python programs from a warmed up, forking interpreter.
+
+A snapshot of the initialized heap cannot be embedded in the binary: objects
+hold addresses that differ per process, and interpreter state, thread states,
+locks and file descriptors cannot be restored from a file. Instead, a server
+process imports the warm-up modules once, freezes them out of the garbage
+collector, and forks for every program to run. The children share the warmed
+heap copy on write and skip "site", "sysconfig", "encodings" and the warm-up
+imports entirely.
+
+Start the server with the modules to warm up, which default to the ones in
+NUITKA_PYTHON_WARMSTART_PRELOAD, separated by commas:
+
+    python -m warmstart serve /tmp/app.sock --preload app.cli,requests
+
+Then run programs through it, as with the interpreter, with the standard
+streams, arguments, environment and working directory of the client:
+
+    python -I -S -m warmstart run /tmp/app.sock -m app.cli --help
+
+The client only needs this module, so run it with "-I -S" to keep its own
+startup minimal. Handlers that stay resident, like serverless functions, can
+call "serve" with a handler of their own instead. This needs "os.fork" and
+is not available on Windows.
+
+Only the user running the server can use its socket, which is created with
+mode 0600. Where the platform reports the peer credentials, requests from
+other users are rejected as well.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+
+_header = struct.Struct("!I")
+_status = struct.Struct("!i")
+
+# Requests are read by the server loop, so a stalled client must not block it.
+_request_timeout = 5.0
+
+
+def get_preload_modules():
+    preload = os.environ.get("NUITKA_PYTHON_WARMSTART_PRELOAD", "")
+    return [module.strip() for module in preload.split(",") if module.strip()]
+
+
+def warm_up(modules):
+    """Import the modules and keep them out of garbage collection.
+
+    Frozen objects are never traversed by the collector of the children,
+    which would otherwise touch, and so copy, every page of the warmed heap.
+    """
+    import gc
+    import importlib
+
+    for module in modules:
+        importlib.import_module(module)
+
+    gc.collect()
+    gc.freeze()
+
+
+def _recv_exactly(conn, size):
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed by peer.")
+        data += chunk
+    return data
+
+
+def _run_request(request):
+    """Run a request in the forked child, return its exit status."""
+    import runpy
+    import traceback
+
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+
+    args = request["args"]
+    try:
+        if args[0] == "-m":
+            sys.argv = args[1:]
+            sys.path.insert(0, os.getcwd())
+            runpy.run_module(args[1], run_name="__main__", alter_sys=True)
+        elif args[0] == "-c":
+            sys.argv = ["-c"] + args[2:]
+            sys.path.insert(0, "")
+            exec(compile(args[1], "<string>", "exec"), {"__name__": "__main__"})
+        else:
+            sys.argv = args
+            sys.path.insert(0, os.path.dirname(os.path.abspath(args[0])))
+            runpy.run_path(args[0], run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        elif isinstance(e.code, int):
+            return e.code
+        else:
+            print(e.code, file=sys.stderr)
+            return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    else:
+        return 0
+
+
+def _check_peer(conn):
+    if not hasattr(socket, "SO_PEERCRED"):
+        return
+
+    _pid, uid, _gid = struct.unpack(
+        "3i", conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    )
+    if uid != os.getuid():
+        raise PermissionError("Request from user %d rejected." % uid)
+
+
+def _is_valid_request(request):
+    return (
+        isinstance(request, dict)
+        and isinstance(request.get("args"), list)
+        and request["args"]
+        and all(isinstance(arg, str) for arg in request["args"])
+        and isinstance(request.get("cwd"), str)
+        and isinstance(request.get("env"), dict)
+    )
+
+
+def _recv_request(conn):
+    _check_peer(conn)
+
+    conn.settimeout(_request_timeout)
+    data, fds, _flags, _addr = socket.recv_fds(conn, _header.size, 3)
+    if len(data) != _header.size or len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ConnectionError("Malformed warmstart request.")
+
+    try:
+        length = _header.unpack(data)[0]
+        request = json.loads(_recv_exactly(conn, length).decode("utf8"))
+        if not _is_valid_request(request):
+            raise ValueError("Malformed warmstart request.")
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+    conn.settimeout(None)
+
+    return request, fds
+
+
+def _finalize_child():
+    import atexit
+    import threading
+
+    # Like interpreter shutdown does, which "os._exit" skips: wait for the
+    # non-daemon threads, then run the exit handlers.
+    try:
+        threading._shutdown()
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+    atexit._run_exitfuncs()
+
+
+def _run_child(request, fds, handler, server_sockets):
+    import signal
+
+    status = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for server_socket in server_sockets:
+            server_socket.close()
+
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+
+        status = handler(request)
+    finally:
+        _finalize_child()
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(status)
+
+
+def serve(socket_path, preload=None, handler=_run_request):
+    """Warm up, then fork and run "handler" for every client request.
+
+    The handler gets the request, with "args", "cwd" and "env" of the
+    client, and returns the exit status to report to it.
+    """
+    import selectors
+    import signal
+
+    if not hasattr(os, "fork"):
+        raise OSError("warmstart needs os.fork, which this platform lacks.")
+
+    warm_up(get_preload_modules() if preload is None else preload)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Connecting needs write permission, other users must not run code as us.
+    old_umask = os.umask(0o177)
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    listener.listen(64)
+
+    # Child exits wake up the loop through the signal wakeup fd.
+    wakeup_read, wakeup_write = socket.socketpair()
+    wakeup_write.setblocking(False)
+    signal.set_wakeup_fd(wakeup_write.fileno())
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    # Stopping the server should still remove its socket.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wakeup_read, selectors.EVENT_READ)
+
+    clients = {}
+    try:
+        while True:
+            for key, _events in selector.select():
+                if key.fileobj is wakeup_read:
+                    wakeup_read.recv(4096)
+                    continue
+
+                conn, _addr = listener.accept()
+                try:
+                    request, fds = _recv_request(conn)
+                except (OSError, ValueError) as e:
+                    print("warmstart: bad request: %s" % e, file=sys.stderr)
+                    conn.close()
+                    continue
+
+                for stream in (sys.stdout, sys.stderr):
+                    stream.flush()
+
+                pid = os.fork()
+                if pid == 0:
+                    _run_child(
+                        request, fds, handler, (listener, wakeup_read, wakeup_write, conn)
+                    )
+
+                for fd in fds:
+                    os.close(fd)
+                clients[pid] = conn
+
+            while clients:
+                try:
+                    pid, wait_status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid == 0:
+                    break
+
+                conn = clients.pop(pid, None)
+                if conn is not None:
+                    if os.WIFSIGNALED(wait_status):
+                        status = -os.WTERMSIG(wait_status)
+                    else:
+                        status = os.WEXITSTATUS(wait_status)
+                    try:
+                        conn.sendall(_status.pack(status))
+                    except OSError:
+                        pass
+                    conn.close()
+    finally:
+        signal.set_wakeup_fd(-1)
+        selector.close()
+        listener.close()
+        for conn in clients.values():
+            conn.close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+
+def run(socket_path, args):
+    """Run interpreter arguments in the server, return the exit status."""
+    request = json.dumps(
+        {"args": args, "cwd": os.getcwd(), "env": dict(os.environ)}
+    ).encode("utf8")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(socket_path)
+        socket.send_fds(conn, [_header.pack(len(request))], [0, 1, 2])
+        conn.sendall(request)
+
+        status = _status.unpack(_recv_exactly(conn, _status.size))[0]
+
+    # Like shells do, report death by a signal as 128 plus its number.
+    return 128 - status if status < 0 else status
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="warm up and serve requests")
+    serve_parser.add_argument("socket", help="unix socket path")
+    serve_parser.add_argument(
+        "--preload",
+        help="comma separated modules to warm up "
+        "(default: NUITKA_PYTHON_WARMSTART_PRELOAD)",
+    )
+
+    run_parser = subparsers.add_parser("run", help="run a program in the server")
+    run_parser.add_argument("socket", help="unix socket path")
+    run_parser.add_argument(
+        "args",
+        nargs=argparse.REMAINDER,
+        help='a script, or "-m module" or "-c command", and its arguments',
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        preload = None
+        if args.preload is not None:
+            preload = [module for module in args.preload.split(",") if module]
+        serve(args.socket, preload)
+    else:
+        if not args.args or (args.args[0] in ("-m", "-c") and len(args.args) < 2):
+            parser.error("run needs a script, -m module or -c command")
+        sys.exit(run(args.socket, args.args))
+
+
+if __name__ == "__main__":
+    main()
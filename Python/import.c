@@ -26,6 +26,7 @@ extern "C" {
 
 /* Forward references */
 static PyObject *import_add_module(PyThreadState *tstate, PyObject *name);
+static void clear_inittab_index(void);
 
 /* See _PyImport_FixupExtensionObject() below */
 static PyObject *extensions = NULL;
@@ -36,6 +37,12 @@ extern struct _inittab _PyImport_Inittab[];
 struct _inittab *PyImport_Inittab = _PyImport_Inittab;
 static struct _inittab *inittab_copy = NULL;
 
+/* Sorted index into PyImport_Inittab. Statically linked interpreters can have
+   hundreds of entries, so builtin module lookups must not scan the table. */
+static struct _inittab **inittab_index = NULL;
+static struct _inittab *inittab_index_table = NULL;
+static size_t inittab_index_size = 0;
+
 /*[clinic input]
 module _imp
 [clinic start generated code]*/
@@ -256,6 +263,8 @@ _PyImport_Fini2(void)
     inittab_copy = NULL;
 
     PyMem_SetAllocator(PYMEM_DOMAIN_RAW, &old_alloc);
+
+    clear_inittab_index();
 }
 
 /* Helper for sys */
@@ -872,21 +881,118 @@ _imp__fix_co_filename_impl(PyObject *module, PyCodeObject *code,
 }
 
 
+/* Helpers for the sorted index into PyImport_Inittab */
+
+static int
+inittab_index_compare(const void *a, const void *b)
+{
+    const struct _inittab *x = *(const struct _inittab * const *)a;
+    const struct _inittab *y = *(const struct _inittab * const *)b;
+    int res = strcmp(x->name, y->name);
+    if (res != 0) {
+        return res;
+    }
+    /* Keep the table order for duplicate names, the first entry wins. */
+    return (x > y) - (x < y);
+}
+
+static int
+update_inittab_index(void)
+{
+    size_t i, n;
+    struct _inittab **index;
+
+    if (inittab_index != NULL && inittab_index_table == PyImport_Inittab) {
+        return 0;
+    }
+    clear_inittab_index();
+
+    for (n = 0; PyImport_Inittab[n].name != NULL; n++)
+        ;
+
+    /* Use the same memory allocator than PyImport_ExtendInittab(). */
+    PyMemAllocatorEx old_alloc;
+    _PyMem_SetDefaultAllocator(PYMEM_DOMAIN_RAW, &old_alloc);
+    index = PyMem_RawMalloc(sizeof(struct _inittab *) * (n + 1));
+    PyMem_SetAllocator(PYMEM_DOMAIN_RAW, &old_alloc);
+    if (index == NULL) {
+        return -1;
+    }
+
+    for (i = 0; i < n; i++) {
+        index[i] = &PyImport_Inittab[i];
+    }
+    qsort(index, n, sizeof(struct _inittab *), inittab_index_compare);
+
+    inittab_index = index;
+    inittab_index_table = PyImport_Inittab;
+    inittab_index_size = n;
+    return 0;
+}
+
+static void
+clear_inittab_index(void)
+{
+    PyMemAllocatorEx old_alloc;
+    _PyMem_SetDefaultAllocator(PYMEM_DOMAIN_RAW, &old_alloc);
+    PyMem_RawFree(inittab_index);
+    PyMem_SetAllocator(PYMEM_DOMAIN_RAW, &old_alloc);
+
+    inittab_index = NULL;
+    inittab_index_table = NULL;
+    inittab_index_size = 0;
+}
+
+static struct _inittab *
+find_inittab_entry(PyObject *name)
+{
+    if (PyUnicode_IS_READY(name) && PyUnicode_IS_ASCII(name)
+        && update_inittab_index() == 0)
+    {
+        const char *name_str = (const char *)PyUnicode_1BYTE_DATA(name);
+        size_t lo = 0, hi = inittab_index_size;
+
+        /* Find the first entry not sorting before the name. */
+        while (lo < hi) {
+            size_t mid = lo + (hi - lo) / 2;
+            if (strcmp(inittab_index[mid]->name, name_str) < 0) {
+                lo = mid + 1;
+            }
+            else {
+                hi = mid;
+            }
+        }
+        if (lo < inittab_index_size
+            && strcmp(inittab_index[lo]->name, name_str) == 0
+            && strlen(name_str) == (size_t)PyUnicode_GET_LENGTH(name))
+        {
+            return inittab_index[lo];
+        }
+        return NULL;
+    }
+
+    for (struct _inittab *p = PyImport_Inittab; p->name != NULL; p++) {
+        if (_PyUnicode_EqualToASCIIString(name, p->name)) {
+            return p;
+        }
+    }
+    return NULL;
+}
+
+
 /* Helper to test for built-in module */
 
 static int
 is_builtin(PyObject *name)
 {
-    int i;
-    for (i = 0; PyImport_Inittab[i].name != NULL; i++) {
-        if (_PyUnicode_EqualToASCIIString(name, PyImport_Inittab[i].name)) {
-            if (PyImport_Inittab[i].initfunc == NULL)
-                return -1;
-            else
-                return 1;
-        }
+    struct _inittab *p = find_inittab_entry(name);
+    if (p == NULL) {
+        return 0;
     }
-    return 0;
+    if (p->initfunc == NULL) {
+        return -1;
+    }
+    return 1;
 }
 
 
@@ -985,40 +1091,39 @@ create_builtin(PyThreadState *tstate, PyObject *name, PyObject *spec)
     }
 
     PyObject *modules = tstate->interp->modules;
-    for (struct _inittab *p = PyImport_Inittab; p->name != NULL; p++) {
-        if (_PyUnicode_EqualToASCIIString(name, p->name)) {
-            if (p->initfunc == NULL) {
-                /* Cannot re-init internal module ("sys" or "builtins") */
-                mod = PyImport_AddModuleObject(name);
-                return Py_XNewRef(mod);
-            }
-            mod = _PyImport_InitFunc_TrampolineCall(*p->initfunc);
-            if (mod == NULL) {
-                return NULL;
-            }
+    struct _inittab *p = find_inittab_entry(name);
+    if (p == NULL) {
+        // not found
+        Py_RETURN_NONE;
+    }
 
-            if (PyObject_TypeCheck(mod, &PyModuleDef_Type)) {
-                return PyModule_FromDefAndSpec((PyModuleDef*)mod, spec);
-            }
-            else {
-                /* Remember pointer to module init function. */
-                PyModuleDef *def = PyModule_GetDef(mod);
-                if (def == NULL) {
-                    return NULL;
-                }
+    if (p->initfunc == NULL) {
+        /* Cannot re-init internal module ("sys" or "builtins") */
+        mod = PyImport_AddModuleObject(name);
+        return Py_XNewRef(mod);
+    }
+    mod = _PyImport_InitFunc_TrampolineCall(*p->initfunc);
+    if (mod == NULL) {
+        return NULL;
+    }
 
-                def->m_base.m_init = p->initfunc;
-                if (_PyImport_FixupExtensionObject(mod, name, name,
-                                                   modules) < 0) {
-                    return NULL;
-                }
-                return mod;
-            }
-        }
+    if (PyObject_TypeCheck(mod, &PyModuleDef_Type)) {
+        return PyModule_FromDefAndSpec((PyModuleDef*)mod, spec);
     }
+    else {
+        /* Remember pointer to module init function. */
+        PyModuleDef *def = PyModule_GetDef(mod);
+        if (def == NULL) {
+            return NULL;
+        }
 
-    // not found
-    Py_RETURN_NONE;
+        def->m_base.m_init = p->initfunc;
+        if (_PyImport_FixupExtensionObject(mod, name, name,
+                                           modules) < 0) {
+            return NULL;
+        }
+        return mod;
+    }
 }
 
 
@@ -2624,6 +2729,7 @@ PyImport_ExtendInittab(struct _inittab *newtab)
     }
     memcpy(p + i, newtab, (n + 1) * sizeof(struct _inittab));
     PyImport_Inittab = inittab_copy = p;
+    clear_inittab_index();
 
 done:
     PyMem_SetAllocator(PYMEM_DOMAIN_RAW, &old_alloc);
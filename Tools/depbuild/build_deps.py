@@ -0,0 +1,573 @@
+"""Build the static libraries Nuitka-Python links, as a dependency graph.
+
+Libraries whose prerequisites are installed build concurrently, the longest
+remaining chain first, sharing a global make job budget. Completed builds
+leave a stamp in the prefix, keyed by a hash of their version, build commands,
+compiler flags and the keys of their prerequisites, so reruns only build what
+changed, and wiping the prefix rebuilds everything. A critical path report of
+the build times is printed at the end.
+
+The environment is expected to be set up like build.sh does, with PREFIX and
+the compiler flags exported. Build commands get the make job count in JOBS.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+CONFIGURE = "./configure --prefix=${PREFIX} --disable-shared"
+MAKE = "make -j$JOBS"
+
+# name: version, download URL, source directory, build commands and the
+# libraries that must be installed in the prefix before it can be configured.
+LIBRARIES = {
+    "ncurses": dict(
+        version="6.4",
+        url="https://ftp.gnu.org/gnu/ncurses/ncurses-6.4.tar.gz",
+        source_dir="ncurses-6.4",
+        commands=[
+            "./configure --prefix=${PREFIX} --disable-shared --enable-termcap "
+            "--enable-widec --enable-getcap",
+            MAKE,
+            "make install",
+            'for header in ${PREFIX}/include/ncursesw/*; do '
+            'ln -sf ncursesw/$(basename $header) ${PREFIX}/include/; done',
+        ],
+        requires=[],
+    ),
+    "editline": dict(
+        version="1.17.1",
+        url="https://github.com/troglobit/editline/releases/download/1.17.1/editline-1.17.1.tar.gz",
+        source_dir="editline-1.17.1",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "sqlite": dict(
+        version="3440000",
+        url="https://sqlite.org/2023/sqlite-autoconf-3440000.tar.gz",
+        source_dir="sqlite-autoconf-3440000",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["ncurses", "editline"],
+    ),
+    "openssl": dict(
+        version="3.1.4",
+        url="https://www.openssl.org/source/openssl-3.1.4.tar.gz",
+        source_dir="openssl-3.1.4",
+        commands=[
+            "./Configure --prefix=${PREFIX} --libdir=lib linux-x86_64 "
+            "enable-ec_nistp_64_gcc_128 no-shared no-tests",
+            "make depend all -j$JOBS",
+            "make install",
+        ],
+        requires=[],
+    ),
+    "bzip2": dict(
+        version="1.0.8",
+        url="https://sourceware.org/pub/bzip2/bzip2-1.0.8.tar.gz",
+        source_dir="bzip2-1.0.8",
+        commands=['make install "PREFIX=$PREFIX" -j$JOBS'],
+        requires=[],
+    ),
+    "util-linux": dict(
+        version="2.39",
+        url="https://mirrors.edge.kernel.org/pub/linux/utils/util-linux/v2.39/util-linux-2.39.tar.gz",
+        source_dir="util-linux-2.39",
+        commands=[
+            CONFIGURE + " --disable-all-programs --enable-libuuid",
+            MAKE,
+            "make install",
+            "cp ./libuuid/src/uuid.h ${PREFIX}/include/",
+        ],
+        requires=[],
+    ),
+    "xz": dict(
+        version="5.4.5",
+        url="https://downloads.sourceforge.net/project/lzmautils/xz-5.4.5.tar.gz",
+        source_dir="xz-5.4.5",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "libffi": dict(
+        version="3.4.4",
+        url="https://github.com/libffi/libffi/releases/download/v3.4.4/libffi-3.4.4.tar.gz",
+        source_dir="libffi-3.4.4",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "zlib": dict(
+        version="latest",
+        url="https://www.zlib.net/current/zlib.tar.gz",
+        source_dir="zlib-latest",
+        commands=["./configure --prefix=${PREFIX} --static", MAKE, "make install"],
+        requires=[],
+    ),
+    "libxcrypt": dict(
+        version="4.4.36",
+        url="https://github.com/besser82/libxcrypt/releases/download/v4.4.36/libxcrypt-4.4.36.tar.xz",
+        source_dir="libxcrypt-4.4.36",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "libpng": dict(
+        version="1.6.39",
+        url="http://downloads.sourceforge.net/project/libpng/libpng16/1.6.39/libpng-1.6.39.tar.xz",
+        source_dir="libpng-1.6.39",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["zlib"],
+    ),
+    "harfbuzz": dict(
+        version="8.3.0",
+        url="https://github.com/harfbuzz/harfbuzz/releases/download/8.3.0/harfbuzz-8.3.0.tar.xz",
+        source_dir="harfbuzz-8.3.0",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "xtrans": dict(
+        version="1.5.0",
+        url="https://xorg.freedesktop.org/releases/individual/lib/xtrans-1.5.0.tar.gz",
+        source_dir="xtrans-1.5.0",
+        commands=[
+            "./configure --prefix=${PREFIX} --datarootdir=${PREFIX}/lib",
+            MAKE,
+            "make install",
+        ],
+        requires=[],
+    ),
+    "xcb-proto": dict(
+        version="1.16.0",
+        url="https://xorg.freedesktop.org/archive/individual/proto/xcb-proto-1.16.0.tar.gz",
+        source_dir="xcb-proto-1.16.0",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "libXau": dict(
+        version="1.0.11",
+        url="https://xorg.freedesktop.org/releases/individual/lib/libXau-1.0.11.tar.gz",
+        source_dir="libXau-1.0.11",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "libXdmcp": dict(
+        version="1.1.4",
+        url="https://xorg.freedesktop.org/releases/individual/lib/libXdmcp-1.1.4.tar.gz",
+        source_dir="libXdmcp-1.1.4",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "libxcb": dict(
+        version="1.16",
+        url="https://xorg.freedesktop.org/releases/individual/lib/libxcb-1.16.tar.gz",
+        source_dir="libxcb-1.16",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["xcb-proto", "libXau", "libXdmcp"],
+    ),
+    "libX11": dict(
+        version="1.8.7",
+        url="https://xorg.freedesktop.org/releases/individual/lib/libX11-1.8.7.tar.gz",
+        source_dir="libX11-1.8.7",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["xtrans", "libxcb"],
+    ),
+    "libXext": dict(
+        version="1.3.5",
+        url="https://xorg.freedesktop.org/releases/individual/lib/libXext-1.3.5.tar.gz",
+        source_dir="libXext-1.3.5",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["libX11"],
+    ),
+    "libXScrnSaver": dict(
+        version="1.2.4",
+        url="https://xorg.freedesktop.org/releases/individual/lib/libXScrnSaver-1.2.4.tar.gz",
+        source_dir="libXScrnSaver-1.2.4",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["libX11", "libXext"],
+    ),
+    "libXrender": dict(
+        version="0.9.11",
+        url="https://xorg.freedesktop.org/releases/individual/lib/libXrender-0.9.11.tar.gz",
+        source_dir="libXrender-0.9.11",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["libX11"],
+    ),
+    "libXrandr": dict(
+        version="1.5.4",
+        url="https://xorg.freedesktop.org/releases/individual/lib/libXrandr-1.5.4.tar.gz",
+        source_dir="libXrandr-1.5.4",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["libX11", "libXext", "libXrender"],
+    ),
+    "freetype": dict(
+        version="2.13.2",
+        url="https://download.savannah.gnu.org/releases/freetype/freetype-2.13.2.tar.gz",
+        source_dir="freetype-2.13.2",
+        commands=[CONFIGURE + " --with-brotli=no", MAKE, "make install"],
+        requires=["zlib", "bzip2", "libpng", "harfbuzz"],
+    ),
+    "expat": dict(
+        version="2.5.0",
+        url="https://github.com/libexpat/libexpat/releases/download/R_2_5_0/expat-2.5.0.tar.gz",
+        source_dir="expat-2.5.0",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "fontconfig": dict(
+        version="2.15.0",
+        url="https://www.freedesktop.org/software/fontconfig/release/fontconfig-2.15.0.tar.gz",
+        source_dir="fontconfig-2.15.0",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["freetype", "expat"],
+    ),
+    "libXft": dict(
+        version="2.3.8",
+        url="https://xorg.freedesktop.org/releases/individual/lib/libXft-2.3.8.tar.gz",
+        source_dir="libXft-2.3.8",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=["libX11", "libXrender", "freetype", "fontconfig"],
+    ),
+    "tcl": dict(
+        version="8.6.13",
+        url="http://downloads.sourceforge.net/project/tcl/Tcl/8.6.13/tcl8.6.13-src.tar.gz",
+        source_dir="tcl8.6.13",
+        commands=[
+            "cd unix && ./configure --prefix=${PREFIX} --enable-shared=no --enable-threads",
+            "cd unix && " + MAKE,
+            "cd unix && make install",
+        ],
+        requires=[],
+    ),
+    "tk": dict(
+        version="8.6.13",
+        url="http://downloads.sourceforge.net/project/tcl/Tcl/8.6.13/tk8.6.13-src.tar.gz",
+        source_dir="tk8.6.13",
+        commands=[
+            "cd unix && ./configure --prefix=${PREFIX} --enable-shared=no "
+            "--enable-threads --with-tcl=${PREFIX}/lib",
+            "cd unix && " + MAKE + ' "X11_LIB_SWITCHES=-l:libX11.a -l:libxcb.a '
+            "-l:libXss.a -l:libfontconfig.a -l:libXft.a -l:libXext.a -l:libXrandr.a "
+            "-l:libXau.a -l:libXrender.a -l:libXdmcp.a -l:libfreetype.a -l:libexpat.a "
+            '-l:libpng.a -l:libharfbuzz.a -l:libX11.a -l:libxcb.a -l:libbz2.a"',
+            "cd unix && make install",
+        ],
+        requires=[
+            "tcl",
+            "libX11",
+            "libxcb",
+            "libXScrnSaver",
+            "fontconfig",
+            "libXft",
+            "libXext",
+            "libXrandr",
+            "libXau",
+            "libXrender",
+            "libXdmcp",
+            "freetype",
+            "expat",
+            "libpng",
+            "harfbuzz",
+            "bzip2",
+        ],
+    ),
+    "mpdecimal": dict(
+        version="4.0.0",
+        url="https://www.bytereef.org/software/mpdecimal/releases/mpdecimal-4.0.0.tar.gz",
+        source_dir="mpdecimal-4.0.0",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+    "libb2": dict(
+        version="0.98.1",
+        url="https://github.com/BLAKE2/libb2/releases/download/v0.98.1/libb2-0.98.1.tar.gz",
+        source_dir="libb2-0.98.1",
+        commands=[CONFIGURE, MAKE, "make install"],
+        requires=[],
+    ),
+}
+
+# Environment that changes build results, part of the stamp keys.
+KEY_ENVIRONMENT = ("CC", "CXX", "CFLAGS", "CXXFLAGS", "CPPFLAGS", "LDFLAGS", "PREFIX")
+
+
+def check_graph(libraries):
+    """Check prerequisites exist and form no cycles, return a topological order."""
+    order = []
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            sys.exit("Error, dependency cycle: %s" % " -> ".join(path + [name]))
+        if name not in libraries:
+            sys.exit("Error, unknown library '%s' required by '%s'." % (name, path[-1]))
+
+        state[name] = "visiting"
+        for prerequisite in libraries[name]["requires"]:
+            visit(prerequisite, path + [name])
+        state[name] = "done"
+        order.append(name)
+
+    for name in libraries:
+        visit(name, [])
+
+    return order
+
+
+def get_build_keys(libraries, order):
+    keys = {}
+    for name in order:
+        library = libraries[name]
+        key_data = [
+            name,
+            library["version"],
+            library["url"],
+            library["commands"],
+            [os.environ.get(variable, "") for variable in KEY_ENVIRONMENT],
+            [keys[prerequisite] for prerequisite in sorted(library["requires"])],
+        ]
+        keys[name] = hashlib.sha256(json.dumps(key_data).encode("utf8")).hexdigest()
+    return keys
+
+
+def get_stamp_filename(stamp_dir, name):
+    return os.path.join(stamp_dir, name + ".json")
+
+
+def load_stamp(stamp_dir, name):
+    try:
+        with open(get_stamp_filename(stamp_dir, name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_remaining_path_lengths(libraries, order, durations):
+    """Duration of the longest chain of builds from each library to the end."""
+    dependents = {name: [] for name in libraries}
+    for name in order:
+        for prerequisite in libraries[name]["requires"]:
+            dependents[prerequisite].append(name)
+
+    lengths = {}
+    for name in reversed(order):
+        lengths[name] = durations.get(name, 60.0) + max(
+            (lengths[dependent] for dependent in dependents[name]), default=0.0
+        )
+    return lengths
+
+
+def build_library(name, library, work_dir, log_dir, jobs):
+    archive = os.path.join(work_dir, name + "-" + os.path.basename(library["url"]))
+    source_dir = os.path.join(work_dir, library["source_dir"])
+    log_filename = os.path.join(log_dir, name + ".log")
+
+    env = dict(os.environ, JOBS=str(jobs))
+
+    with open(log_filename, "w") as log_file:
+
+        def run(command, cwd):
+            log_file.write("+ %s\n" % command)
+            log_file.flush()
+            subprocess.run(
+                ["bash", "-e", "-c", command],
+                cwd=cwd,
+                env=env,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                check=True,
+            )
+
+        run('curl -L --fail -o "%s" "%s"' % (archive, library["url"]), work_dir)
+
+        # Builds happen in the source tree, start from a clean one.
+        if os.path.isdir(source_dir):
+            shutil.rmtree(source_dir)
+        extract_dir = os.path.join(work_dir, "." + name + "-extract")
+        if os.path.isdir(extract_dir):
+            shutil.rmtree(extract_dir)
+        os.makedirs(extract_dir)
+        run('tar -xf "%s"' % archive, extract_dir)
+        (top_level,) = os.listdir(extract_dir)
+        os.rename(os.path.join(extract_dir, top_level), source_dir)
+        os.rmdir(extract_dir)
+
+        for command in library["commands"]:
+            run(command, source_dir)
+
+
+def build_all(libraries, work_dir, stamp_dir, total_jobs, max_parallel, force=()):
+    order = check_graph(libraries)
+    keys = get_build_keys(libraries, order)
+
+    log_dir = os.path.join(work_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    os.makedirs(stamp_dir, exist_ok=True)
+
+    stamps = {name: load_stamp(stamp_dir, name) for name in order}
+    to_build = [
+        name
+        for name in order
+        if name in force or stamps[name].get("key") != keys[name]
+    ]
+    for name in order:
+        if name not in to_build:
+            print("Up to date: %s %s" % (name, libraries[name]["version"]))
+
+    # Previous build times prioritize the longest chains, unknown ones count as a minute.
+    lengths = get_remaining_path_lengths(
+        libraries,
+        order,
+        {name: stamp["duration"] for name, stamp in stamps.items() if "duration" in stamp},
+    )
+
+    timings = {}
+    start_time = time.perf_counter()
+
+    def build(name, jobs):
+        print("Building %s %s with %d jobs..." % (name, libraries[name]["version"], jobs))
+
+        started = time.perf_counter()
+        build_library(name, libraries[name], work_dir, log_dir, jobs)
+        finished = time.perf_counter()
+
+        with open(get_stamp_filename(stamp_dir, name), "w") as f:
+            json.dump({"key": keys[name], "duration": finished - started}, f)
+        timings[name] = (started - start_time, finished - start_time)
+        print("Built %s in %.1fs." % (name, finished - started))
+
+    waiting = sorted(to_build, key=lambda name: -lengths[name])
+    # Future to name and jobs of the builds in progress, only used by this thread.
+    running = {}
+    done = set()
+    failed = None
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        while (waiting and failed is None) or running:
+            ready = []
+            if failed is None:
+                ready = [
+                    name
+                    for name in waiting
+                    if all(
+                        prerequisite in done or prerequisite not in to_build
+                        for prerequisite in libraries[name]["requires"]
+                    )
+                ][: max_parallel - len(running)]
+
+            # The jobs not taken by running builds are split among the ones
+            # starting now, so a lone build at the end of a chain gets them all.
+            free_jobs = total_jobs - sum(jobs for _name, jobs in running.values())
+            for index, name in enumerate(ready):
+                jobs = max(1, free_jobs // (len(ready) - index))
+                free_jobs -= jobs
+
+                waiting.remove(name)
+                running[executor.submit(build, name, jobs)] = name, jobs
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, _jobs = running.pop(future)
+                try:
+                    future.result()
+                except subprocess.CalledProcessError:
+                    print(
+                        "Error, building %s failed, see %s."
+                        % (name, os.path.join(log_dir, name + ".log"))
+                    )
+                    failed = name
+                else:
+                    done.add(name)
+
+    if failed is not None:
+        sys.exit(1)
+
+    report_critical_path(libraries, timings, time.perf_counter() - start_time)
+
+
+def report_critical_path(libraries, timings, wall_time):
+    if not timings:
+        print("Nothing to build.")
+        return
+
+    # Walk back from the build that finished last, through the prerequisite
+    # that finished last, which is what held up each build.
+    path = [max(timings, key=lambda name: timings[name][1])]
+    while True:
+        prerequisites = [
+            prerequisite
+            for prerequisite in libraries[path[-1]]["requires"]
+            if prerequisite in timings
+        ]
+        if not prerequisites:
+            break
+        path.append(max(prerequisites, key=lambda name: timings[name][1]))
+
+    total = sum(finished - started for started, finished in timings.values())
+    print(
+        "Built %d libraries in %.1fs wall time, %.1fs build time in total."
+        % (len(timings), wall_time, total)
+    )
+    print("Critical path:")
+    for name in reversed(path):
+        started, finished = timings[name]
+        print(
+            "  %-14s %8.1fs  (from %.1fs to %.1fs)"
+            % (name, finished - started, started, finished)
+        )
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--work-dir", default="dep-build", help="where sources are downloaded and built"
+    )
+    parser.add_argument(
+        "--stamp-dir",
+        help="where completed builds are recorded (default: PREFIX/.build-stamps)",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=cpu_count, help="total make job budget"
+    )
+    parser.add_argument(
+        "-p",
+        "--parallel",
+        type=int,
+        default=min(4, cpu_count),
+        help="libraries to build at the same time",
+    )
+    parser.add_argument(
+        "--force", nargs="*", default=(), help="libraries to rebuild even if up to date"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="print the libraries in build order and exit"
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        for name in check_graph(LIBRARIES):
+            print(name, LIBRARIES[name]["version"], " ".join(LIBRARIES[name]["requires"]))
+        return
+
+    if "PREFIX" not in os.environ:
+        sys.exit("Error, PREFIX must be set to the installation prefix.")
+
+    build_all(
+        LIBRARIES,
+        os.path.abspath(args.work_dir),
+        args.stamp_dir or os.path.join(os.environ["PREFIX"], ".build-stamps"),
+        max(1, args.jobs),
+        max(1, args.parallel),
+        set(args.force),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark builtin module lookups against the size of the inittab.
+
+Statically linked interpreters register every extension module in the
+inittab, so lookups through the builtin importer must stay cheap as the table
+grows. Pass the interpreters to compare, e.g. a base build and one relinked
+with many static extension modules; each one is run in a subprocess and
+reports its inittab size and lookup times.
+
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+
+MEASURE = r"""
+import _imp
+import json
+import sys
+import timeit
+from importlib.machinery import BuiltinImporter
+
+names = sorted(sys.builtin_module_names)
+last = names[-1]
+missing = "_no_such_builtin_module"
+number = {number}
+
+def per_call(stmt, name):
+    timer = timeit.Timer(stmt, globals=dict(globals(), name=name))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+print(json.dumps({{
+    "inittab_size": len(names),
+    "is_builtin_last_ns": per_call("_imp.is_builtin(name)", last),
+    "is_builtin_missing_ns": per_call("_imp.is_builtin(name)", missing),
+    "find_spec_missing_ns": per_call("BuiltinImporter.find_spec(name)", missing),
+}}))
+"""
+
+
+def measure(executable, number):
+    output = subprocess.check_output(
+        [executable, "-c", MEASURE.format(number=number)])
+    return json.loads(output)
+
+
+def main(executables, number):
+    print("{:>8} {:>18} {:>21} {:>20}  {}".format(
+        "inittab", "is_builtin(last)", "is_builtin(missing)",
+        "find_spec(missing)", "interpreter"))
+    results = [(measure(executable, number), executable)
+               for executable in executables]
+    for result, executable in sorted(results,
+                                     key=lambda x: x[0]["inittab_size"]):
+        print("{inittab_size:>8} {is_builtin_last_ns:>15.1f} ns "
+              "{is_builtin_missing_ns:>18.1f} ns "
+              "{find_spec_missing_ns:>17.1f} ns  ".format(**result)
+              + executable)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("executables", nargs="*", default=[sys.executable],
+                        help="interpreters to compare (default: this one)")
+    parser.add_argument("-n", "--number", type=int, default=100000,
+                        help="lookups per timing run")
+    args = parser.parse_args()
+    main(args.executables, args.number)
@@ -185,8 +185,15 @@ export "LDFLAGS=-L${PREFIX}/lib"
   LIBS="-lffi -lbz2 -luuid -lsqlite3 -llzma" \
   ax_cv_c_float_words_bigendian=no
 
+# Train PGO with our own workload if given, see "python -m __np__.pgo".
+PROFILE_TASK='./Lib/test/regrtest.py -j 8 -x test_bsddb3 test_compiler test_cpickle test_cprofile test_dbm_dumb test_dbm_ndbm test_distutils test_ensurepip test_gdb test_io test_linuxaudiodev test_multiprocessing test_ossaudiodev test_platform test_pydoc test_socketserver test_subprocess test_sundry test_thread test_threaded_import test_threadedtempfile test_threading test_threading_local test_threadsignals test_xmlrpc test_zipfile'
+if [ -n "$NUITKA_PYTHON_PGO_TRAINING" ]
+then
+  PROFILE_TASK="-m __np__.pgo --include-tests='$PROFILE_TASK'"
+fi
+
 make -j 32 \
-        PROFILE_TASK='./Lib/test/regrtest.py -j 8 -x test_bsddb3 test_compiler test_cpickle test_cprofile test_dbm_dumb test_dbm_ndbm test_distutils test_ensurepip test_gdb test_io test_linuxaudiodev test_multiprocessing test_ossaudiodev test_platform test_pydoc test_socketserver test_subprocess test_sundry test_thread test_threaded_import test_threadedtempfile test_threading test_threading_local test_threadsignals test_xmlrpc test_zipfile' \
+        PROFILE_TASK="$PROFILE_TASK" \
         profile-opt
 
 make build_all_merge_profile